@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Player, Gage, MasterkillEvent, Game, GamePlayerStats, RedeployEvent, ReviveEvent
+from .models import Player, Gage, MasterkillEvent, Game, GamePlayerStats, RedeployEvent, ReviveEvent, PlayerLifetimeStats, OCRJob
 
 # Si vous n'utilisez plus le modèle Player, vous pouvez commenter ou supprimer PlayerAdmin et son enregistrement.
 # Pour l'instant, je le laisse si vous l'utilisez ailleurs, mais les relations principales pointent vers User.
@@ -105,6 +105,33 @@ class ReviveEventAdmin(admin.ModelAdmin):
     def revived_username_display(self, obj):
         return obj.revived_player.username if obj.revived_player else None
 
+class PlayerLifetimeStatsAdmin(admin.ModelAdmin):
+    list_display = ('player_username_display', 'total_score', 'total_kills', 'total_deaths', 'games_played', 'mks_won', 'kd_ratio', 'updated_at')
+    search_fields = ('player__username',)
+    ordering = ('-total_score',)
+    # Table dérivée : tenue à jour par les écritures, réparée par `manage.py rebuild_lifetime_stats`
+    readonly_fields = ('player', 'total_score', 'total_kills', 'total_deaths', 'total_assists', 'total_revives_done',
+                       'total_gulag_wins', 'total_rage_quits', 'total_times_redeployed', 'games_played',
+                       'mks_won', 'kd_ratio', 'updated_at')
+
+    @admin.display(description='Utilisateur (Joueur)', ordering='player__username')
+    def player_username_display(self, obj):
+        return obj.player.username if obj.player else None
+
+class OCRJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'game_info_admin', 'status', 'uploaded_by', 'created_at', 'finished_at', 'applied_at')
+    list_filter = ('status',)
+    search_fields = ('game__masterkill_event__name', 'uploaded_by__username')
+    ordering = ('-created_at',)
+    raw_id_fields = ('game', 'uploaded_by')
+    readonly_fields = ('status', 'players', 'error', 'started_at', 'finished_at', 'applied_at')
+
+    @admin.display(description='Infos Partie', ordering='game__masterkill_event__name')
+    def game_info_admin(self, obj):
+        if obj.game and obj.game.masterkill_event:
+            return f"MK: {obj.game.masterkill_event.name} - P{obj.game.game_number}"
+        return "N/A"
+
 # Si vous décidez de ne plus utiliser le modèle Player, commentez ou supprimez la ligne suivante :
 admin.site.register(Player, PlayerAdmin) 
 admin.site.register(Gage, GageAdmin)
@@ -112,4 +139,6 @@ admin.site.register(MasterkillEvent, MasterkillEventAdmin)
 admin.site.register(Game, GameAdmin)
 admin.site.register(GamePlayerStats, GamePlayerStatsAdmin)
 admin.site.register(RedeployEvent, RedeployEventAdmin)
-admin.site.register(ReviveEvent, ReviveEventAdmin) # Enregistrement du nouveau modèle
\ No newline at end of file
+admin.site.register(ReviveEvent, ReviveEventAdmin) # Enregistrement du nouveau modèle
+admin.site.register(PlayerLifetimeStats, PlayerLifetimeStatsAdmin)
+admin.site.register(OCRJob, OCRJobAdmin)
\ No newline at end of file
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .timing import install_db_wrapper
+        connection_created.connect(install_db_wrapper, dispatch_uid='api.timing.install_db_wrapper')
@@ -0,0 +1,62 @@
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Game, MasterkillEvent, RedeployEvent, ReviveEvent
+
+# GET conditionnels (ETag / Last-Modified) pour les vues d'un événement : détail, aggregated-stats,
+# game-scores, kills-by-spawn. Le validateur tient en une requête : updated_at de l'événement,
+# max(updated_at) et nombre de ses parties (une partie supprimée change le nombre), et le dernier
+# réa / redéploiement enregistré (id et horodatage) : ces écritures, les plus fréquentes, ne touchent pas la partie.
+# Les autres écritures qui modifient des GamePlayerStats sans sauver la partie appellent touch_game().
+
+
+def touch_game(game_id):
+    Game.objects.filter(pk=game_id).update(updated_at=timezone.now())
+
+
+def event_validators(mk_event_id):
+    """
+    Renvoie (etag, last_modified) de l'événement, ou None s'il n'existe pas.
+    """
+    # sous-requêtes plutôt que jointures : le Count des parties ne doit pas être multiplié par les événements
+    latest = {
+        f"{name}_{column}": Subquery(model.objects.filter(game__masterkill_event=OuterRef('pk')).order_by('-id').values(column)[:1])
+        for name, model in (('revive', ReviveEvent), ('redeploy', RedeployEvent)) for column in ('id', 'timestamp')
+    }
+    row = (MasterkillEvent.objects.filter(pk=mk_event_id)
+           .annotate(games_updated_at=Max('games__updated_at'), games_count=Count('games'), **latest)
+           .values_list('id', 'updated_at', 'games_updated_at', 'games_count', *latest)
+           .first())
+    if row is None:
+        return None
+    event_id, updated_at, games_updated_at, games_count, revive_id, revive_at, redeploy_id, redeploy_at = row
+    last_modified = max(filter(None, (updated_at, games_updated_at, revive_at, redeploy_at)))
+    digest = hashlib.sha1(
+        f"{event_id}:{updated_at.isoformat()}:{games_updated_at and games_updated_at.isoformat()}:{games_count}"
+        f":{revive_id}:{redeploy_id}".encode()
+    )
+    # faible : le JSON peut différer selon le rendu négocié (navigable / json) pour un même état
+    return f'W/{quote_etag(digest.hexdigest()[:20])}', last_modified
+
+
+def not_modified(request, validators):
+    # 304 (ou 412) si le client a déjà cet état, sinon None et la vue calcule sa réponse
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    return with_validators(response, validators) if response is not None else None
+
+
+def with_validators(response, validators):
+    if validators is not None and response.status_code in (200, 304):
+        etag, last_modified = validators
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+        # le navigateur revalide à chaque fois au lieu de servir une copie jugée « fraîche » par heuristique
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
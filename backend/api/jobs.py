@@ -0,0 +1,174 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OCRJob, GamePlayerStats
+from . import metrics, ocr_cache, timing
+from .matching import resolve_players
+from .ocr import cached_players, read_screenshot
+from .stats import completed_game_write
+
+# File d'attente OCR adossée à la base (pas de broker externe) :
+#   - UploadScreenshotView appelle enqueue_ocr_job() et répond 202 ;
+#   - `manage.py ocr_worker` réserve les jobs (claim_ocr_jobs) et exécute run_ocr() dans un pool de processus ;
+#   - apply_ocr_job() reporte les joueurs lus dans GamePlayerStats, sur demande explicite.
+# Un lot (batch_id) regroupe plusieurs captures d'une même partie : le pool les traite en parallèle,
+# merge_batch_players() fusionne les lignes et apply_ocr_batch() les écrit en une transaction.
+
+
+def _new_ocr_job(game, user, upfile, batch_id=None):
+    image = b"".join(upfile.chunks())
+    uploaded_by = user if user and user.is_authenticated else None
+    if ocr_cache.enabled():
+        # Capture déjà lue (ré-upload, copie envoyée par un coéquipier) : job terminé d'office
+        with timing.phase('ocr'):
+            players = cached_players(image)
+        if players is not None:
+            metrics.OCR_JOBS.labels('cached').inc()
+            now = timezone.now()
+            return OCRJob(
+                game=game, uploaded_by=uploaded_by, batch_id=batch_id, status='done', players=players,
+                started_at=now, finished_at=now,
+            )
+    return OCRJob(game=game, uploaded_by=uploaded_by, batch_id=batch_id, image=image)
+
+
+def enqueue_ocr_job(game, user, upfile):
+    job = _new_ocr_job(game, user, upfile)
+    job.save()
+    return job
+
+
+def enqueue_ocr_batch(game, user, upfiles):
+    batch_id = uuid.uuid4()
+    return batch_id, OCRJob.objects.bulk_create([_new_ocr_job(game, user, f, batch_id) for f in upfiles])
+
+
+def run_ocr(image: bytes):
+    # Exécuté dans un processus du pool : pas d'accès à la base, au cache ni à un fichier temporaire ici.
+    # Renvoie (joueurs, clés de cache), à passer à finish_ocr_job.
+    with metrics.OCR_DURATION.time():
+        players, cache_keys = read_screenshot(image)
+    metrics.OCR_ROWS.observe(len(players))
+    return players, cache_keys
+
+
+def requeue_stale_ocr_jobs():
+    # Un worker tué en plein traitement laisse des jobs 'running' : on les remet en file
+    deadline = timezone.now() - timedelta(seconds=settings.OCR_JOB_TIMEOUT)
+    return OCRJob.objects.filter(status='running', started_at__lt=deadline).update(status='pending', started_at=None)
+
+
+def requeue_ocr_jobs(job_ids):
+    # Jobs perdus avec un processus du pool (image pas encore vidée) : remis en file tels quels
+    return OCRJob.objects.filter(id__in=job_ids, status='running').update(status='pending', started_at=None)
+
+
+def claim_ocr_jobs(limit):
+    """
+    Réserve jusqu'à `limit` jobs en attente (les plus anciens d'abord) et renvoie [(id, image)].
+    SKIP LOCKED permet à plusieurs workers de se partager la file sans se marcher dessus.
+    """
+    with transaction.atomic():
+        job_ids = list(
+            OCRJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending').order_by('created_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not job_ids:
+            return []
+        OCRJob.objects.filter(id__in=job_ids).update(status='running', started_at=timezone.now())
+    jobs = OCRJob.objects.filter(id__in=job_ids).order_by('created_at').values_list('id', 'image')
+    return [(job_id, bytes(image)) for job_id, image in jobs]
+
+
+def finish_ocr_job(job_id, players=None, error=None, cache_keys=()):
+    # L'image n'est plus utile une fois lue : on la vide pour ne pas gonfler la table
+    metrics.OCR_JOBS.labels('failed' if error else 'done').inc()
+    if not error and ocr_cache.enabled():
+        ocr_cache.set_many(cache_keys, players or [])
+    OCRJob.objects.filter(id=job_id).update(
+        status='failed' if error else 'done',
+        players=players or [],
+        error=error or '',
+        image=b'',
+        finished_at=timezone.now(),
+    )
+
+
+def batch_status(jobs):
+    statuses = {job.status for job in jobs}
+    if statuses & {'pending', 'running'}:
+        return 'running' if 'running' in statuses or 'done' in statuses else 'pending'
+    return 'failed' if statuses == {'failed'} else 'done'
+
+
+def merge_batch_players(jobs):
+    # Dédoublonnage par gamertag (insensible à la casse) : la lecture la plus sûre l'emporte,
+    # à confiance égale (ou inconnue) la première capture du lot
+    merged = {}
+    for job in sorted(jobs, key=lambda j: j.id):
+        if job.status != 'done':
+            continue
+        for p in job.players:
+            key = p["gamertag"].strip().casefold()
+            if key not in merged or p.get("confidence", -1) > merged[key].get("confidence", -1):
+                merged[key] = p
+    return list(merged.values())
+
+
+# colonnes OCR (ocr.STAT_COLUMNS) -> champs de GamePlayerStats ; deaths n'est écrit que si toutes les lignes l'ont
+OCR_STAT_FIELDS = {"kills": "kills", "revives": "revives_done", "deaths": "deaths"}
+
+
+def _apply_players(game, players):
+    """
+    Écrit les lignes OCR rapprochées d'un joueur connu (voir api.matching) ; les autres sont
+    renvoyées dans `unmatched` au lieu de créer des comptes.
+    """
+    matched, unmatched = resolve_players(game.masterkill_event, players, settings.OCR_MATCH_MAX_DISTANCE)
+    stats_by_player_id = {}
+    for user, p in matched:
+        if user.id in stats_by_player_id:
+            # deux lignes lues pour le même joueur : on garde la première
+            unmatched.append(p)
+            continue
+        stats_by_player_id[user.id] = (user, p)
+
+    if stats_by_player_id:
+        columns = [c for c in OCR_STAT_FIELDS if all(c in p for _, p in stats_by_player_id.values())]
+        # partie déjà terminée : scores recalculés, écart reporté sur les totaux all-time
+        with completed_game_write(game, stats_by_player_id.keys()):
+            GamePlayerStats.objects.bulk_create(
+                [GamePlayerStats(game=game, player=user, **{OCR_STAT_FIELDS[c]: p[c] for c in columns})
+                 for user, p in stats_by_player_id.values()],
+                update_conflicts=True,
+                unique_fields=['game', 'player'],
+                update_fields=[OCR_STAT_FIELDS[c] for c in columns],
+            )
+
+    game.has_auto_stats = True
+    game.save(update_fields=['has_auto_stats', 'updated_at'])
+    return {
+        "matched": [{"gamertag": p["gamertag"], "player_id": user.id, "username": user.username}
+                    for user, p in stats_by_player_id.values()],
+        "unmatched": unmatched,
+    }
+
+
+@transaction.atomic
+def apply_ocr_job(job):
+    report = _apply_players(job.game, job.players)
+    job.applied_at = timezone.now()
+    job.save(update_fields=['applied_at'])
+    return report
+
+
+@transaction.atomic
+def apply_ocr_batch(jobs):
+    report = _apply_players(jobs[0].game, merge_batch_players(jobs))
+    OCRJob.objects.filter(id__in=[job.id for job in jobs]).update(applied_at=timezone.now())
+    return report
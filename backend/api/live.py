@@ -0,0 +1,129 @@
+import asyncio
+import itertools
+import json
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Diffusion en direct des changements d'un Masterkill, flux Server-Sent Events par événement
+# (voir views.masterkill_event_stream, servi uniquement par l'application ASGI config.asgi) :
+#   - les vues d'écriture appellent publish() : le message part après le commit, jamais sur un rollback ;
+#   - chaque message est un delta compact ({"type": ..., "mk_id": ..., ...}) : le client recharge
+#     seulement ce qui a changé au lieu de redemander l'événement complet en boucle ;
+#   - le broker (LIVE_EVENTS_BACKEND, chemin pointé) répartit les messages entre les abonnés.
+#     LocalBroker garde les abonnés en mémoire : il ne voit que les écritures de son propre processus,
+#     avec plusieurs workers il faut un broker partagé exposant la même interface (subscribe / unsubscribe / publish).
+
+
+def _frame(message_id, kind, payload):
+    # sérialisé une seule fois, puis envoyé tel quel à chaque abonné
+    data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f"id: {message_id}\nevent: {kind}\ndata: {data}\n\n"
+
+
+class Subscription:
+    """
+    File d'un client du flux, consommée dans la boucle asyncio de sa requête.
+    Un client trop lent (file pleine) est déconnecté : il se reconnecte et recharge l'état.
+    """
+
+    def __init__(self, loop, size):
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    def put(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        # None si rien n'est arrivé pendant `timeout` secondes
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}            # mk_event_id -> set[Subscription]
+        self._ids = itertools.count(1)
+
+    def subscribe(self, mk_event_id):
+        subscription = Subscription(asyncio.get_running_loop(), settings.LIVE_EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(mk_event_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, mk_event_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(mk_event_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[mk_event_id]
+
+    def subscriber_count(self, mk_event_id):
+        with self._lock:
+            return len(self._subscribers.get(mk_event_id, ()))
+
+    def publish(self, mk_event_id, kind, payload):
+        # appelé depuis le thread de la vue : chaque file est alimentée dans la boucle de son abonné
+        with self._lock:
+            subscribers = list(self._subscribers.get(mk_event_id, ()))
+        if not subscribers:
+            return
+        frame = _frame(next(self._ids), kind, payload)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, frame)
+            except RuntimeError:          # boucle fermée : requête terminée, désinscription en cours
+                pass
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.LIVE_EVENTS_BACKEND)()
+    return _broker
+
+
+def set_broker(broker):
+    # remplace le broker du processus (broker de substitution local, autre transport) ; None = recharger depuis les réglages
+    global _broker
+    _broker = broker
+
+
+def publish(mk_event_id, kind, **payload):
+    payload = {"type": kind, "mk_id": mk_event_id, **payload}
+    transaction.on_commit(lambda: get_broker().publish(mk_event_id, kind, payload))
+
+
+async def event_stream(mk_event_id):
+    broker = get_broker()
+    subscription = broker.subscribe(mk_event_id)
+    try:
+        yield f"retry: {settings.LIVE_EVENTS_RETRY_MS}\n\n"
+        while True:
+            frame = await subscription.get(settings.LIVE_EVENTS_HEARTBEAT)
+            if frame is None:
+                # commentaire SSE : garde la connexion ouverte derrière les proxys
+                yield ": ping\n\n"
+                continue
+            yield frame
+            if subscription.overflowed and subscription.queue.empty():
+                return
+    finally:
+        broker.unsubscribe(mk_event_id, subscription)
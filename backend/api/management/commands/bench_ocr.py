@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ocr
+from api.ocr_bench import BenchmarkFailed, build_cases, run_benchmark
+
+
+def _csv(cast):
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def _resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+class Command(BaseCommand):
+    help = "Mesure débit, latence, mémoire et précision de l'OCR sur des scoreboards synthétiques."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', action='append', dest='backends',
+                            help=f"Backend OCR à mesurer, répétable (choix : {', '.join(ocr.BACKENDS)}). Défaut : celui des settings.")
+        parser.add_argument('--pool-size', type=int, default=None,
+                            help="Moteurs tesserocr du backend mesuré (défaut : OCR_ENGINE_POOL_SIZE).")
+        parser.add_argument('--resolutions', type=_csv(_resolution), default=[(1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)])
+        parser.add_argument('--noise', type=_csv(float), default=[0.0, 8.0, 20.0], help="Écarts-types du bruit gaussien.")
+        parser.add_argument('--font-scales', type=_csv(float), default=[0.8, 1.0, 1.3])
+        parser.add_argument('--images', type=int, default=3, help="Captures par configuration.")
+        parser.add_argument('--rows', type=int, default=10, help="Joueurs par capture.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--save-dir', help="Enregistre les captures générées (PNG) dans ce dossier.")
+        parser.add_argument('--json', dest='json_path', help="Écrit le rapport complet en JSON.")
+
+    def handle(self, *args, **options):
+        backends = []
+        for name in options['backends'] or [ocr.get_backend().name]:
+            try:
+                backends.append(ocr.make_backend(name, options['pool_size'] or settings.OCR_ENGINE_POOL_SIZE))
+            except (ImportError, ValueError) as exc:
+                raise CommandError(f"Backend {name!r} indisponible : {exc}")
+
+        cases = build_cases(options['resolutions'], options['noise'], options['font_scales'],
+                            options['images'], options['rows'], options['seed'])
+        self.stdout.write(f"{len(cases)} capture(s) générée(s).")
+        if options['save_dir']:
+            save_dir = Path(options['save_dir'])
+            save_dir.mkdir(parents=True, exist_ok=True)
+            for i, case in enumerate(cases):
+                (save_dir / f"{i:03d}_{case.width}x{case.height}_n{case.noise:g}_f{case.font_scale:g}.png").write_bytes(case.png)
+
+        reports = []
+        for backend in backends:
+            try:
+                report = run_benchmark(cases, backend)
+            except BenchmarkFailed as exc:
+                raise CommandError(str(exc))
+            reports.append(report)
+            overall = report['overall']
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {backend.name} =="))
+            self.stdout.write(f"{'configuration':<40} {'img/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'précision':>10}")
+            for label, row in report['configs'].items():
+                self.stdout.write(f"{label:<40} {row['images_per_s']:>7} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['row_accuracy']:>10.1%}")
+            self.stdout.write(
+                f"{'TOTAL':<40} {overall['images_per_s']:>7} {overall['p50_ms']:>8} {overall['p95_ms']:>8} {overall['row_accuracy']:>10.1%}"
+                f"   ({overall['errors']} erreur(s), pic RSS {report['peak_rss_mb']['self']:.0f} Mo"
+                f" + fils {report['peak_rss_mb']['children']:.0f} Mo)"
+            )
+            if overall['error_types']:
+                self.stderr.write("Erreurs : " + ", ".join(f"{kind} x{count}" for kind, count in overall['error_types'].items()))
+
+        if options['json_path']:
+            Path(options['json_path']).write_text(json.dumps(reports, indent=2))
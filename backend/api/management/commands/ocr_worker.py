@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api import ocr
+from api.jobs import claim_ocr_jobs, finish_ocr_job, requeue_ocr_jobs, requeue_stale_ocr_jobs, run_ocr
+
+
+class Command(BaseCommand):
+    help = "Traite la file des jobs OCR (api.OCRJob) dans un pool de processus local."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.OCR_WORKER_PROCESSES,
+            help="Nombre de processus OCR en parallèle (défaut : OCR_WORKER_PROCESSES).",
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Traite les jobs en attente puis s'arrête (utile en cron).",
+        )
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        try:
+            ocr.get_backend()     # moteurs chargés à la demande : ne vérifie que la dépendance
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+        requeued = requeue_stale_ocr_jobs()
+        if requeued:
+            self.stdout.write(f"{requeued} job(s) bloqué(s) remis en file.")
+
+        self.stdout.write(f"Worker OCR démarré ({processes} processus).")
+        # jobs déjà perdus une fois avec un processus mort : à la deuxième, ils sont marqués en échec
+        self.suspects = set()
+        while not self._serve(processes, options['once']):
+            self.stderr.write("Pool OCR recréé après la mort d'un processus.")
+
+    def _serve(self, processes, once):
+        """
+        Traite la file jusqu'à épuisement (--once) ou jusqu'à la mort d'un processus du pool
+        (OOM dans OpenCV / Tesseract : BrokenProcessPool). Renvoie False s'il faut recréer le pool.
+        """
+        poll_interval = settings.OCR_WORKER_POLL_INTERVAL
+        # Les processus fils ne touchent pas la base : on ne leur laisse pas de connexion héritée
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            running = {}
+            while True:
+                free_slots = processes - len(running)
+                if free_slots:
+                    claimed = claim_ocr_jobs(free_slots)
+                    for i, (job_id, image) in enumerate(claimed):
+                        try:
+                            running[pool.submit(run_ocr, image)] = job_id
+                        except BrokenProcessPool:
+                            self._recover([*running.values(), *(job_id for job_id, _ in claimed[i:])])
+                            return False
+
+                if not running:
+                    if once:
+                        return True
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        players, cache_keys = future.result()
+                    except BrokenProcessPool:
+                        self._recover([job_id, *running.values()])
+                        return False
+                    except Exception as exc:
+                        finish_ocr_job(job_id, error=str(exc) or exc.__class__.__name__)
+                        self.stderr.write(f"Job OCR #{job_id} en échec : {exc!r}")
+                    else:
+                        self.suspects.discard(job_id)
+                        finish_ocr_job(job_id, players=players, cache_keys=cache_keys)
+                        self.stdout.write(f"Job OCR #{job_id} terminé : {len(players)} joueur(s).")
+
+    def _recover(self, job_ids):
+        # Tous les jobs en cours sont perdus avec le pool. Seul en cours, ou déjà perdu une fois, un job
+        # est tenu pour responsable et marqué en échec ; les autres repartent en file.
+        culprits = set(job_ids) if len(job_ids) == 1 else self.suspects.intersection(job_ids)
+        for job_id in culprits:
+            finish_ocr_job(job_id, error="Processus OCR interrompu (mémoire insuffisante ?)")
+            self.stderr.write(f"Job OCR #{job_id} en échec : processus OCR interrompu.")
+        retry = [job_id for job_id in job_ids if job_id not in culprits]
+        self.suspects.update(retry)
+        requeued = requeue_ocr_jobs(retry)
+        if requeued:
+            self.stderr.write(f"{requeued} job(s) remis en file.")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import PlayerLifetimeStats
+from api.stats import LIFETIME_FIELDS, lifetime_totals, refresh_lifetime_stats
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la table PlayerLifetimeStats (classement all-time) et la compare aux agrégats en direct."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help="Ne reconstruit pas la table, vérifie seulement qu'elle correspond aux agrégats en direct.",
+        )
+
+    def handle(self, *args, **options):
+        if not options['check_only']:
+            with transaction.atomic():
+                PlayerLifetimeStats.objects.all().delete()
+                refresh_lifetime_stats()
+            self.stdout.write(f"Table reconstruite : {PlayerLifetimeStats.objects.count()} joueur(s).")
+
+        live = lifetime_totals()
+        stored = {row.pop('player_id'): row for row in PlayerLifetimeStats.objects.values('player_id', *LIFETIME_FIELDS)}
+
+        mismatches = []
+        for player_id in sorted(live.keys() | stored.keys()):
+            expected, actual = live.get(player_id), stored.get(player_id)
+            if expected is None or actual is None:
+                mismatches.append(f"joueur {player_id} : {'absent de la table' if actual is None else 'ligne en trop'}")
+                continue
+            diffs = [f"{field}={actual[field]} (attendu {expected[field]})" for field in LIFETIME_FIELDS if actual[field] != expected[field]]
+            if diffs:
+                mismatches.append(f"joueur {player_id} : " + ", ".join(diffs))
+
+        if mismatches:
+            for line in mismatches:
+                self.stderr.write(line)
+            raise CommandError(f"{len(mismatches)} écart(s) entre PlayerLifetimeStats et les agrégats en direct.")
+        self.stdout.write(self.style.SUCCESS(f"OK : {len(live)} joueur(s) conformes aux agrégats en direct."))
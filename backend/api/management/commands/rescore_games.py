@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import GamePlayerStats, MasterkillEvent
+from api.stats import (
+    GAME_STATS_FIELDS, compute_game_score, game_revives_subquery, refresh_lifetime_stats, rescore_events, scored_rows
+)
+
+
+class Command(BaseCommand):
+    help = "Recalcule score_in_game avec le barème actuel des Masterkill (tous, ou ceux passés en --event)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event', type=int, action='append', dest='events', metavar='ID',
+            help="Événement à recalculer (répétable). Par défaut : tout l'historique.",
+        )
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help="Ne modifie rien, vérifie seulement que les scores stockés correspondent à compute_game_score().",
+        )
+
+    def handle(self, *args, **options):
+        events = MasterkillEvent.objects.order_by('pk')
+        if options['events']:
+            events = events.filter(pk__in=options['events'])
+            missing = set(options['events']) - set(events.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Événement(s) introuvable(s) : {', '.join(map(str, sorted(missing)))}.")
+        events = list(events)
+
+        if not options['check_only']:
+            started = time.perf_counter()
+            with transaction.atomic():
+                rows = rescore_events(events if options['events'] else None)
+                # le total all-time dépend des scores par partie
+                if options['events']:
+                    refresh_lifetime_stats(GamePlayerStats.objects.filter(
+                        game__masterkill_event__in=events).values_list('player_id', flat=True).distinct())
+                else:
+                    refresh_lifetime_stats()
+            self.stdout.write(
+                f"{rows} ligne(s) recalculée(s) sur {len(events)} événement(s) en {time.perf_counter() - started:.2f} s."
+            )
+
+        # contrôle côté Python, indépendant de l'expression SQL de rescore_events
+        events_by_id = {mk_event.pk: mk_event for mk_event in events}
+        rows = scored_rows(events if options['events'] else None).annotate(revives=game_revives_subquery()).values(
+            'game__masterkill_event_id', 'game_id', 'player_id', 'game__kill_multiplier', 'revives', 'score_in_game',
+            *GAME_STATS_FIELDS,
+        )
+        mismatches = []
+        checked = 0
+        for row in rows.iterator(chunk_size=2000):
+            checked += 1
+            mk_event = events_by_id[row['game__masterkill_event_id']]
+            expected = compute_game_score(mk_event, row['game__kill_multiplier'], **row)
+            if expected != row['score_in_game']:
+                mismatches.append(
+                    f"MK {mk_event.pk} partie {row['game_id']} joueur {row['player_id']} : "
+                    f"score={row['score_in_game']} (attendu {expected})"
+                )
+
+        if mismatches:
+            for line in mismatches:
+                self.stderr.write(line)
+            raise CommandError(f"{len(mismatches)} score(s) ne correspondent pas au barème actuel.")
+        self.stdout.write(self.style.SUCCESS(f"OK : {checked} score(s) conformes au barème actuel."))
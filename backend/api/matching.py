@@ -0,0 +1,96 @@
+import re
+from typing import Dict, List, Optional
+
+from django.contrib.auth.models import User
+
+# Rapprochement des gamertags lus par l'OCR avec les participants du Masterkill.
+# Les pseudos sont normalisés (casse, caractères confondus par l'OCR, tag de clan) puis comparés
+# par distance d'édition bornée. Une ligne sans correspondance est signalée, jamais transformée en User.
+
+_CLAN_TAG_RE = re.compile(r"^\s*[\[\(\{][^\]\)\}]{1,6}[\]\)\}]\s*")
+_ACTIVISION_ID_RE = re.compile(r"#\d+$")
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]")
+# caractères que l'OCR confond : on les ramène à une seule forme, avant de retirer la ponctuation ('|')
+_CONFUSABLES = str.maketrans({'0': 'o', '1': 'l', 'i': 'l', '|': 'l', '5': 's', '8': 'b'})
+
+
+def normalize_gamertag(tag: str) -> str:
+    tag = _CLAN_TAG_RE.sub("", tag.strip())
+    tag = _ACTIVISION_ID_RE.sub("", tag)
+    return _NON_ALNUM_RE.sub("", tag.casefold().translate(_CONFUSABLES))
+
+
+def bounded_distance(a: str, b: str, max_distance: int) -> int:
+    # Levenshtein avec abandon dès que toute la ligne dépasse max_distance (renvoie alors max_distance + 1)
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class GamertagMatcher:
+    def __init__(self, users, max_distance: int = 2):
+        self.max_distance = max_distance
+        self._index: Dict[str, List[User]] = {}
+        for user in users:
+            self._index.setdefault(normalize_gamertag(user.username), []).append(user)
+
+    def _max_distance_for(self, key: str) -> int:
+        # pas de tolérance sur les pseudos très courts : trop de faux positifs
+        return min(self.max_distance, len(key) // 4)
+
+    def match(self, gamertag: str) -> Optional[User]:
+        key = normalize_gamertag(gamertag)
+        if not key:
+            return None
+        exact = self._index.get(key)
+        if exact:
+            return exact[0] if len(exact) == 1 else None
+        max_distance = self._max_distance_for(key)
+        if not max_distance:
+            return None
+        best, best_distance, ambiguous = None, max_distance + 1, False
+        for candidate_key, users in self._index.items():
+            distance = bounded_distance(key, candidate_key, max_distance)
+            if distance < best_distance:
+                best, best_distance, ambiguous = users[0], distance, len(users) > 1
+            elif distance == best_distance and distance <= max_distance:
+                ambiguous = True
+        return None if ambiguous else best
+
+
+def resolve_players(mk_event, players, max_distance: int = 2):
+    """
+    Associe chaque ligne OCR à un participant du MK : rapprochement approché, puis, pour les lignes
+    restées ambiguës, correspondance exacte insensible à la casse sur le pseudo.
+    Les comptes hors du MK ne sont jamais proposés.
+    Renvoie (matched: [(user, row)], unmatched: [row]).
+    """
+    participants = list(mk_event.participants.all())
+    matcher = GamertagMatcher(participants, max_distance)
+    matched, pending = [], []
+    for row in players:
+        user = matcher.match(row["gamertag"])
+        if user is not None:
+            matched.append((user, row))
+        else:
+            pending.append(row)
+
+    if pending:
+        known = {user.username.lower(): user for user in participants}
+        unmatched = []
+        for row in pending:
+            user = known.get(row["gamertag"].strip().lower())
+            if user is not None:
+                matched.append((user, row))
+            else:
+                unmatched.append(row)
+        pending = unmatched
+    return matched, pending
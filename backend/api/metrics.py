@@ -0,0 +1,81 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# Métriques Prometheus exposées par GET /api/metrics (format texte).
+# Plusieurs processus (gunicorn -w N, worker OCR et ses processus fils) : définir PROMETHEUS_MULTIPROC_DIR
+# dans l'environnement AVANT le démarrage, vers un dossier partagé vidé à chaque déploiement.
+# Chaque processus y écrit ses valeurs dans des fichiers mmap, la vue agrège tous les fichiers à la lecture.
+# Sans cette variable, chaque processus n'expose que ses propres compteurs.
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+REQUESTS = Counter(
+    'masterkill_http_requests_total', "Requêtes HTTP traitées.", ['view', 'method', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'masterkill_http_request_duration_seconds', "Durée des requêtes HTTP, mesurée par ServerTimingMiddleware.", ['view'],
+    buckets=[ms / 1000 for ms in LATENCY_BUCKETS_MS],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'masterkill_http_request_db_queries', "Requêtes SQL par requête HTTP.", ['view'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+OCR_JOBS = Counter(
+    'masterkill_ocr_jobs_total', "Jobs OCR terminés, par issue (cached = capture déjà lue, servie par le cache).",
+    ['status'],
+)
+OCR_DURATION = Histogram(
+    'masterkill_ocr_duration_seconds', "Durée de lecture d'une capture par le worker OCR.",
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+OCR_ROWS = Histogram(
+    'masterkill_ocr_rows_parsed', "Lignes joueur lues par capture.",
+    buckets=(0, 1, 2, 4, 6, 8, 10, 15, 20, 30),
+)
+CACHE_REQUESTS = Counter(
+    'masterkill_cache_requests_total', "Lectures de cache, par cache et résultat (hit / miss).", ['cache', 'result'],
+)
+
+
+def observe_request(view, method, status, duration, db_queries):
+    REQUESTS.labels(view, method, str(status)).inc()
+    REQUEST_DURATION.labels(view).observe(duration)
+    REQUEST_DB_QUERIES.labels(view).observe(db_queries)
+
+
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class EventStateCollector:
+    # état courant lu en base à chaque collecte (deux GROUP BY) : identique quel que soit le processus interrogé
+    def collect(self):
+        from django.db.models import Count
+        from .models import Game, MasterkillEvent
+
+        for name, doc, model in (
+            ('masterkill_events', "Événements Masterkill par statut.", MasterkillEvent),
+            ('masterkill_games', "Parties par statut.", Game),
+        ):
+            family = GaugeMetricFamily(name, doc, labels=['status'])
+            counts = dict(model.objects.order_by().values_list('status').annotate(n=Count('id')))
+            for status, _ in model.STATUS_CHOICES:
+                family.add_metric([status], counts.get(status, 0))
+            yield family
+
+
+_state_registry = CollectorRegistry(auto_describe=False)
+_state_registry.register(EventStateCollector())
+
+
+def render():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_state_registry)
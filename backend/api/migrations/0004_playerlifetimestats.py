@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_game_has_auto_stats'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerLifetimeStats',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='lifetime_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur Joueur')),
+                ('total_score', models.IntegerField(default=0, verbose_name='Score total')),
+                ('total_kills', models.PositiveIntegerField(default=0, verbose_name='Kills')),
+                ('total_deaths', models.PositiveIntegerField(default=0, verbose_name='Morts')),
+                ('total_assists', models.PositiveIntegerField(default=0, verbose_name='Assistances')),
+                ('total_revives_done', models.PositiveIntegerField(default=0, verbose_name='Réanimations effectuées')),
+                ('total_gulag_wins', models.PositiveIntegerField(default=0, verbose_name='Goulags gagnés')),
+                ('total_rage_quits', models.PositiveIntegerField(default=0, verbose_name='Rage Quits')),
+                ('total_times_redeployed', models.PositiveIntegerField(default=0, verbose_name='Redéployé par coéquipier')),
+                ('games_played', models.PositiveIntegerField(default=0, verbose_name='Parties jouées')),
+                ('mks_won', models.PositiveIntegerField(default=0, verbose_name='Masterkills gagnés')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Statistiques globales du joueur',
+                'verbose_name_plural': 'Statistiques globales des joueurs',
+                'ordering': ['-total_score', 'player'],
+                'indexes': [models.Index(fields=['-total_score', 'player'], name='lifetime_score_rank_idx')],
+            },
+        ),
+    ]
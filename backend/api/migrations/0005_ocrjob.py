@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_playerlifetimestats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OCRJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.BinaryField(verbose_name="Capture d'écran")),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=10, verbose_name='Statut')),
+                ('players', models.JSONField(blank=True, default=list, verbose_name='Joueurs lus')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Début du traitement')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin du traitement')),
+                ('applied_at', models.DateTimeField(blank=True, null=True, verbose_name='Appliqué aux stats le')),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocr_jobs', to='api.game', verbose_name='Partie')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ocr_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Envoyé par')),
+            ],
+            options={
+                'verbose_name': 'Job OCR',
+                'verbose_name_plural': 'Jobs OCR',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='ocrjob_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_ocrjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrjob',
+            name='batch_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True, verbose_name='Lot'),
+        ),
+    ]
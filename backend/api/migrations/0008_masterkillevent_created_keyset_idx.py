@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_ocrjob_batch_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='masterkillevent',
+            index=models.Index(fields=['-created_at', 'id'], name='mk_created_keyset_idx'),
+        ),
+    ]
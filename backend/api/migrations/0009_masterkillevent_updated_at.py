@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_masterkillevent_created_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='masterkillevent',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Dernière modification'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_masterkillevent_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='redeployevent',
+            name='client_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='Identifiant client'),
+        ),
+        migrations.AddField(
+            model_name='reviveevent',
+            name='client_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='Identifiant client'),
+        ),
+    ]
@@ -30,6 +30,7 @@ class MasterkillEvent(models.Model):
     name = models.CharField(max_length=150, default="Nouveau Masterkill", verbose_name="Nom du Masterkill")
     creator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="created_masterkills", verbose_name="Créateur")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
     effective_start_at = models.DateTimeField(null=True, blank=True, verbose_name="Début effectif")
     ended_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
     
@@ -67,6 +68,9 @@ class MasterkillEvent(models.Model):
         verbose_name = "Événement Masterkill"
         verbose_name_plural = "Événements Masterkill"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='mk_created_keyset_idx'),
+        ]
 
 class Game(models.Model):
     masterkill_event = models.ForeignKey(MasterkillEvent, related_name='games', on_delete=models.CASCADE, verbose_name="Événement Masterkill")
@@ -149,6 +153,8 @@ class RedeployEvent(models.Model):
     redeployer_player = models.ForeignKey(User, related_name='initiated_redeploys', on_delete=models.CASCADE, verbose_name="Utilisateur qui redéploie")
     redeployed_player = models.ForeignKey(User, related_name='was_redeployed_by_log', on_delete=models.CASCADE, verbose_name="Utilisateur redéployé")
     timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Horodatage")
+    # UUID fourni par le client dans un envoi groupé : un renvoi du même événement est ignoré
+    client_id = models.UUIDField(null=True, blank=True, unique=True, editable=False, verbose_name="Identifiant client")
 
     class Meta:
         verbose_name = "Événement de Redéploiement"
@@ -167,6 +173,8 @@ class ReviveEvent(models.Model):
     reviver_player = models.ForeignKey(User, related_name='revives_performed', on_delete=models.CASCADE, verbose_name="Utilisateur qui réanime")
     revived_player = models.ForeignKey(User, related_name='was_revived_events', on_delete=models.CASCADE, verbose_name="Utilisateur réanimé")
     timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Horodatage")
+    # UUID fourni par le client dans un envoi groupé : un renvoi du même événement est ignoré
+    client_id = models.UUIDField(null=True, blank=True, unique=True, editable=False, verbose_name="Identifiant client")
 
     class Meta:
         verbose_name = "Événement de Réanimation"
@@ -178,4 +186,73 @@ class ReviveEvent(models.Model):
         revived_name = self.revived_player.username if self.revived_player else 'N/A'
         game_info = f"Partie {self.game.game_number}" if self.game else "Partie Inconnue"
         mk_info = f"(MK {self.game.masterkill_event.name})" if self.game and self.game.masterkill_event else ""
-        return f"{reviver_name} a réanimé {revived_name} dans {game_info} {mk_info}"
\ No newline at end of file
+        return f"{reviver_name} a réanimé {revived_name} dans {game_info} {mk_info}"
+
+class PlayerLifetimeStats(models.Model):
+    # Table dénormalisée du classement all-time : les vues d'écriture y ajoutent la contribution des parties
+    # modifiées (voir api.stats.apply_lifetime_deltas) ; `manage.py rebuild_lifetime_stats` la vérifie / répare.
+    player = models.OneToOneField(User, primary_key=True, related_name='lifetime_stats', on_delete=models.CASCADE, verbose_name="Utilisateur Joueur")
+    total_score = models.IntegerField(default=0, verbose_name="Score total")
+    total_kills = models.PositiveIntegerField(default=0, verbose_name="Kills")
+    total_deaths = models.PositiveIntegerField(default=0, verbose_name="Morts")
+    total_assists = models.PositiveIntegerField(default=0, verbose_name="Assistances")
+    total_revives_done = models.PositiveIntegerField(default=0, verbose_name="Réanimations effectuées")
+    total_gulag_wins = models.PositiveIntegerField(default=0, verbose_name="Goulags gagnés")
+    total_rage_quits = models.PositiveIntegerField(default=0, verbose_name="Rage Quits")
+    total_times_redeployed = models.PositiveIntegerField(default=0, verbose_name="Redéployé par coéquipier")
+    games_played = models.PositiveIntegerField(default=0, verbose_name="Parties jouées")
+    mks_won = models.PositiveIntegerField(default=0, verbose_name="Masterkills gagnés")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Statistiques globales du joueur"
+        verbose_name_plural = "Statistiques globales des joueurs"
+        ordering = ['-total_score', 'player']
+        indexes = [
+            models.Index(fields=['-total_score', 'player'], name='lifetime_score_rank_idx'),
+        ]
+
+    def __str__(self):
+        player_username = self.player.username if self.player else 'Utilisateur Inconnu'
+        return f"{player_username} : {self.total_score} pts"
+
+    @property
+    def kd_ratio(self):
+        # dérivé à la lecture : un ratio ne se cumule pas partie par partie
+        if self.total_deaths == 0 and self.total_kills > 0:
+            return self.total_kills
+        return round((self.total_kills or 0) / (self.total_deaths if self.total_deaths > 0 else 1), 2)
+
+
+class OCRJob(models.Model):
+    # File d'attente OCR en base : l'upload crée le job, `manage.py ocr_worker` le traite,
+    # l'application des résultats aux stats reste une étape explicite (voir api.jobs).
+    game = models.ForeignKey(Game, related_name='ocr_jobs', on_delete=models.CASCADE, verbose_name="Partie")
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='ocr_jobs', verbose_name="Envoyé par")
+    # Jobs envoyés ensemble (plusieurs captures d'une même partie) : fusionnés puis appliqués en une fois
+    batch_id = models.UUIDField(null=True, blank=True, db_index=True, verbose_name="Lot")
+    image = models.BinaryField(editable=False, verbose_name="Capture d'écran")
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échec'),
+    ]
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Statut")
+    players = models.JSONField(default=list, blank=True, verbose_name="Joueurs lus")
+    error = models.TextField(blank=True, default='', verbose_name="Erreur")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Début du traitement")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin du traitement")
+    applied_at = models.DateTimeField(null=True, blank=True, verbose_name="Appliqué aux stats le")
+
+    class Meta:
+        verbose_name = "Job OCR"
+        verbose_name_plural = "Jobs OCR"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='ocrjob_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"OCR #{self.pk} - Partie {self.game.game_number if self.game else '?'} ({self.get_status_display()})"
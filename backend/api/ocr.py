@@ -1,40 +1,552 @@
-import cv2, pytesseract, tempfile, re
-from PIL import Image
-from typing import List, Dict
+import cv2, pytesseract, re, os, threading, queue, logging, hashlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
-# ratios à ajuster si vous changez de résolution
+from . import ocr_cache, timing
+
+logger = logging.getLogger(__name__)
+
+# ratios fixes du scoreboard : repli quand _locate_scoreboard ne trouve pas le tableau
 CROP = dict(y1=0.12, y2=0.68, x1=0.40, x2=1.00)
+# largeur max du crop avant seuillage : borne la mémoire et le temps Tesseract sur les captures 1440p/4K
+MAX_CROP_WIDTH = 1600
+# Détection du tableau : faite sur une copie réduite à DETECT_WIDTH px de large, puis la zone trouvée
+# est remise à l'échelle pour que le texte fasse TARGET_TEXT_HEIGHT px, quelle que soit la résolution.
+DETECT_WIDTH = 960
+TARGET_TEXT_HEIGHT = 28
+MIN_TABLE_ROWS = 3
 WHITELIST = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789#_ "
+DIGITS = "0123456789"
+# lettres que le LSTM sort à la place d'un chiffre isolé (un "0" seul devient "O") : autorisées puis ramenées au chiffre
+_DIGIT_LOOKALIKES = str.maketrans("oODQlI|SsBZ", "00001115582")
+NUMERIC_WHITELIST = DIGITS + "oODQlI|SsBZ"
+# colonnes numériques du scoreboard, de gauche à droite après le gamertag (les colonnes en trop sont ignorées)
+STAT_COLUMNS = ("kills", "revives", "deaths")
+REQUIRED_COLUMNS = ("kills", "revives")
+
+# relecture sous OCR_MIN_CONFIDENCE, depuis les niveaux de gris agrandis à ces échelles :
+# cellule par cellule avec un backend poolé, une seule passe sur tout le tableau (première échelle) sinon
+RETRY_SCALES = (1.5, 2.0)
+
+PSM_SINGLE_BLOCK = 6
+PSM_SINGLE_LINE = 7
+
+# Moteurs OCR interchangeables. Choix et taille du pool : settings OCR_BACKEND / OCR_ENGINE_POOL_SIZE.
+#   - "tesserocr"   : instances PyTessBaseAPI chargées une fois par processus et réutilisées (défaut) ;
+#   - "pytesseract" : un processus `tesseract` par appel, sur choix explicite (binaire seul, sans libtesseract).
+# `pooled` : un appel coûte peu (moteur déjà chargé), la lecture cellule par cellule est alors rentable ;
+# sinon chaque appel relance tesseract et la capture est lue en une seule passe en bloc.
+# image_to_data renvoie les mots reconnus avec leur confiance Tesseract (0-100) et leur numéro de ligne.
+Word = Tuple[str, float, int]
+
+class PytesseractBackend:
+    name = "pytesseract"
+    pooled = False
+
+    def _config(self, psm, whitelist):
+        return f"--psm {psm} --oem 3 -c tessedit_char_whitelist={whitelist}"
+
+    def image_to_string(self, img: np.ndarray, psm: int = PSM_SINGLE_BLOCK, whitelist: str = WHITELIST) -> str:
+        return pytesseract.image_to_string(img, config=self._config(psm, whitelist))
+
+    def image_to_data(self, img: np.ndarray, psm: int = PSM_SINGLE_BLOCK, whitelist: str = WHITELIST) -> List[Word]:
+        data = pytesseract.image_to_data(img, config=self._config(psm, whitelist), output_type=pytesseract.Output.DICT)
+        lines = {}
+        words = []
+        for text, conf, block, par, line in zip(data["text"], data["conf"], data["block_num"], data["par_num"], data["line_num"]):
+            if text.strip() and float(conf) >= 0:
+                words.append((text.strip(), float(conf), lines.setdefault((block, par, line), len(lines))))
+        return words
+
+class TesserocrBackend:
+    name = "tesserocr"
+    pooled = True
+
+    def __init__(self, pool_size: int = 1, lang: str = "eng"):
+        import tesserocr                      # dépendance optionnelle
+        self._tesserocr = tesserocr
+        self.pool_size = max(1, pool_size)
+        self.lang = lang
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_engine(self):
+        return self._tesserocr.PyTessBaseAPI(lang=self.lang, oem=self._tesserocr.OEM.DEFAULT)
+
+    @contextmanager
+    def _engine(self):
+        api = None
+        while api is None:
+            try:
+                api = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    grow = self._created < self.pool_size
+                    if grow:
+                        self._created += 1
+                if grow:
+                    try:
+                        api = self._new_engine()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                else:
+                    # pool plein : on attend qu'un moteur se libère, en revérifiant régulièrement
+                    # au cas où un chargement en cours aurait échoué (sa place est alors à reprendre)
+                    try:
+                        api = self._idle.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+        try:
+            yield api
+        finally:
+            self._idle.put(api)
+
+    def _prepare(self, api, img, psm, whitelist):
+        from PIL import Image
+        api.SetPageSegMode(psm)
+        api.SetVariable("tessedit_char_whitelist", whitelist)
+        api.SetImage(Image.fromarray(img))
 
-_line_re = re.compile(r"(.+?)\s+(\d+)\s+(\d+)\s+\d+")
+    def image_to_string(self, img: np.ndarray, psm: int = PSM_SINGLE_BLOCK, whitelist: str = WHITELIST) -> str:
+        with self._engine() as api:
+            self._prepare(api, img, psm, whitelist)
+            return api.GetUTF8Text()
 
-def _preprocess(src: str) -> str:
-    img = cv2.imread(src)
-    h, w, _ = img.shape
+    def image_to_data(self, img: np.ndarray, psm: int = PSM_SINGLE_BLOCK, whitelist: str = WHITELIST) -> List[Word]:
+        RIL = self._tesserocr.RIL
+        words, line = [], -1
+        with self._engine() as api:
+            self._prepare(api, img, psm, whitelist)
+            api.Recognize()
+            iterator = api.GetIterator()
+            if iterator is None:
+                return words
+            for word in self._tesserocr.iterate_level(iterator, RIL.WORD):
+                if word.IsAtBeginningOf(RIL.TEXTLINE):
+                    line += 1
+                try:
+                    text = word.GetUTF8Text(RIL.WORD)
+                except RuntimeError:          # mot vide
+                    continue
+                if text.strip():
+                    words.append((text.strip(), word.Confidence(RIL.WORD), max(line, 0)))
+        return words
+
+BACKENDS = {b.name: b for b in (PytesseractBackend, TesserocrBackend)}
+
+_backend = None
+_backend_pid = None
+
+def make_backend(name: str, pool_size: int = 1):
+    # ImportError si la dépendance optionnelle du backend n'est pas installée
+    if name not in BACKENDS:
+        raise ValueError(f"OCR_BACKEND inconnu : {name!r} (choix : {', '.join(BACKENDS)})")
+    return BACKENDS[name](pool_size=pool_size) if name == TesserocrBackend.name else BACKENDS[name]()
+
+def _settings():
+    if settings.configured:
+        return settings.OCR_BACKEND, settings.OCR_ENGINE_POOL_SIZE
+    return os.environ.get("OCR_BACKEND", "tesserocr"), int(os.environ.get("OCR_ENGINE_POOL_SIZE", "1"))
+
+def _row_workers():
+    if settings.configured:
+        return settings.OCR_ROW_WORKERS
+    return int(os.environ.get("OCR_ROW_WORKERS", "4"))
+
+def _min_confidence():
+    if settings.configured:
+        return settings.OCR_MIN_CONFIDENCE
+    return float(os.environ.get("OCR_MIN_CONFIDENCE", "80"))
+
+def get_backend():
+    # Un backend (et donc un pool de moteurs) par processus : après un fork, on en recrée un
+    global _backend, _backend_pid
+    if _backend is None or _backend_pid != os.getpid():
+        name, pool_size = _settings()
+        try:
+            _backend = make_backend(name, pool_size)
+        except ImportError as exc:
+            # pas de repli silencieux : un déploiement sans la dépendance tournerait sans le pool
+            raise ImproperlyConfigured(f"OCR_BACKEND={name!r} indisponible : {exc}") from exc
+        _backend_pid = os.getpid()
+    return _backend
+
+_line_re = re.compile(r"(.+?)((?:\s+\d+){2,})$")
+
+def _decode(data: bytes) -> np.ndarray:
+    # décodage direct en niveaux de gris : 3x moins de mémoire qu'en BGR, et c'est tout ce que le seuillage utilise
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError("Image illisible")
+    return img
+
+def _crop(img: np.ndarray) -> np.ndarray:
+    # renvoie le scoreboard en niveaux de gris, largeur bornée à MAX_CROP_WIDTH
+    h, w = img.shape[:2]
     crop = img[int(CROP['y1']*h):int(CROP['y2']*h),
                int(CROP['x1']*w):int(CROP['x2']*w)]
-    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-    thr = cv2.adaptiveThreshold(gray, 255,
-                                cv2.ADAPTIVE_THRESH_MEAN_C,
-                                cv2.THRESH_BINARY_INV, 25, 15)
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-    cv2.imwrite(tmp.name, thr)
-    return tmp.name
-
-def _parse(text: str) -> List[Dict]:
+    if crop.shape[1] > MAX_CROP_WIDTH:
+        scale = MAX_CROP_WIDTH / crop.shape[1]
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+
+def _text_boxes(small: np.ndarray) -> np.ndarray:
+    """
+    Boîtes (x, y, w, h) des segments de texte d'une image réduite : gradient morphologique
+    (contours des glyphes, insensible à la polarité), seuil d'Otsu, puis fermeture horizontale
+    pour fusionner les caractères d'un même mot / nombre.
+    """
+    h, w = small.shape
+    blur = cv2.GaussianBlur(small, (3, 3), 0)
+    grad = cv2.morphologyEx(blur, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, mask = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, w // 120), 1)))
+    _, _, cc, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    boxes = cc[1:, :4]
+    # hauteur de texte plausible ; un chiffre seul est plus haut que large, le bruit est minuscule ou carré
+    keep = (boxes[:, 3] >= max(4, h * 0.008)) & (boxes[:, 3] <= h * 0.06) & (boxes[:, 2] >= boxes[:, 3] * 0.3)
+    return boxes[keep]
+
+def _text_lines(boxes: np.ndarray) -> List[np.ndarray]:
+    # regroupe les boîtes par ligne de texte (centres verticaux proches), de haut en bas
+    centers = boxes[:, 1] + boxes[:, 3] / 2
+    order = np.argsort(centers)
+    tolerance = np.median(boxes[:, 3]) / 2
+    lines, current = [], [order[0]]
+    for i in order[1:]:
+        if centers[i] - centers[current[-1]] > tolerance:
+            lines.append(boxes[current])
+            current = []
+        current.append(i)
+    lines.append(boxes[current])
+    return lines
+
+def _locate_scoreboard(gray: np.ndarray):
+    """
+    Cherche le tableau des scores : la plus longue suite de lignes de texte régulièrement espacées,
+    limitée aux segments alignés en colonnes (gauche, centre ou droite) sur plusieurs lignes.
+    Renvoie ((x1, y1, x2, y2), hauteur de texte médiane) en pixels de l'image d'origine,
+    ou None si rien de convaincant n'est trouvé (on se rabat alors sur CROP).
+    """
+    h, w = gray.shape[:2]
+    scale = min(1.0, DETECT_WIDTH / w)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    boxes = _text_boxes(small)
+    if len(boxes) < MIN_TABLE_ROWS:
+        return None
+    line = float(np.median(boxes[:, 3]))
+
+    # suites de lignes consécutives espacées de moins de 2,5 hauteurs de texte
+    lines = _text_lines(boxes)
+    runs, run = [], [lines[0]]
+    for previous, current in zip(lines, lines[1:]):
+        if current[:, 1].min() - (previous[:, 1] + previous[:, 3]).max() > 2.5 * line:
+            runs.append(run)
+            run = []
+        run.append(current)
+    runs.append(run)
+    run = max(runs, key=lambda r: (len(r), sum(len(l) for l in r)))
+    if len(run) < MIN_TABLE_ROWS:
+        return None
+
+    # on ne garde que les segments dont un bord ou le centre est partagé par d'autres lignes (colonnes)
+    table = np.concatenate(run)
+    row_of = np.concatenate([np.full(len(l), i) for i, l in enumerate(run)])
+    edges = np.stack([table[:, 0], table[:, 0] + table[:, 2] / 2, table[:, 0] + table[:, 2]], axis=1)
+    aligned = np.abs(edges[:, None, :] - edges[None, :, :]).min(axis=2) <= line / 2
+    aligned &= row_of[:, None] != row_of[None, :]
+    table = table[aligned.sum(axis=1) >= MIN_TABLE_ROWS - 1]
+    if len(table) < MIN_TABLE_ROWS:
+        return None
+
+    x1, y1 = table[:, 0].min(), table[:, 1].min()
+    x2, y2 = (table[:, 0] + table[:, 2]).max(), (table[:, 1] + table[:, 3]).max()
+    pad = line / 2 + 1
+    region = (max(0, x1 - pad), max(0, y1 - pad), min(small.shape[1], x2 + pad), min(small.shape[0], y2 + pad))
+    return tuple(int(v / scale) for v in region), line / scale
+
+def _scoreboard(img: np.ndarray) -> np.ndarray:
+    """
+    Zone du scoreboard en niveaux de gris, texte ramené à TARGET_TEXT_HEIGHT px.
+    Repli sur les ratios fixes de CROP si la détection échoue.
+    """
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    found = _locate_scoreboard(gray)
+    if found is None:
+        logger.debug("Scoreboard non détecté, repli sur CROP")
+        return _crop(gray)
+    (x1, y1, x2, y2), text_height = found
+    region = gray[y1:y2, x1:x2]
+    scale = TARGET_TEXT_HEIGHT / max(1.0, text_height)
+    if abs(scale - 1) > 0.1:
+        region = cv2.resize(region, None, fx=scale, fy=scale,
+                            interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+    return region
+
+def _binarize(gray: np.ndarray) -> np.ndarray:
+    # texte noir sur fond blanc, comme l'attend Tesseract ; le fond (majoritaire) fixe la polarité
+    _, out = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    return out if np.count_nonzero(out) * 2 > out.size else cv2.bitwise_not(out)
+
+def _preprocess(img: np.ndarray) -> np.ndarray:
+    return _binarize(_scoreboard(img))
+
+def _dhash(gray: np.ndarray, size: int = 16) -> str:
+    # hash perceptif (différence de luminosité entre pixels voisins) : stable au ré-encodage / redimensionnement
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes().hex()
+
+def pipeline_fingerprint(backend=None) -> str:
+    # tout ce qui change le résultat de l'OCR doit entrer ici (sert de préfixe aux clés de cache)
+    params = (CROP, MAX_CROP_WIDTH, DETECT_WIDTH, TARGET_TEXT_HEIGHT, MIN_TABLE_ROWS, WHITELIST, NUMERIC_WHITELIST,
+              STAT_COLUMNS, RETRY_SCALES, _min_confidence(), (backend or get_backend()).name)
+    return hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+
+def _stats_row(gamertag: str, numbers: List[str], confidence: Optional[float] = None):
+    row = {"gamertag": gamertag}
+    row.update((column, int(value)) for column, value in zip(STAT_COLUMNS, numbers) if value)
+    if not all(column in row for column in REQUIRED_COLUMNS):
+        return None
+    if confidence is not None:
+        row["confidence"] = round(confidence)
+    return row
+
+def _parse(words: List[Word]) -> List[Dict]:
+    # lecture en bloc (repli) : "gamertag n1 n2 ..." par ligne ; confiance de la ligne = celle de son pire mot
+    lines = {}
+    for text, conf, line in words:
+        lines.setdefault(line, []).append((text, conf))
     out = []
-    for raw in text.splitlines():
-        clean = " ".join(raw.strip().split())
-        m = _line_re.match(clean)
+    for line in lines.values():
+        m = _line_re.match(" ".join(text for text, _ in line))
         if m:
-            name, kills, revs = m.groups()
-            out.append({"gamertag": name,
-                        "kills": int(kills),
-                        "revives": int(revs)})
+            row = _stats_row(m.group(1), m.group(2).split(), min(conf for _, conf in line))
+            if row:
+                out.append(row)
     return out
 
+def _read_block(binary: np.ndarray, gray: np.ndarray, backend) -> List[Dict]:
+    """
+    Lecture en bloc : un appel, plus au plus une relecture de tout le tableau agrandi (RETRY_SCALES[0])
+    si une ligne reste sous OCR_MIN_CONFIDENCE ou si rien n'est lu. Garde la passe qui lit le plus
+    de lignes, puis la plus sûre en moyenne.
+    """
+    rows = _parse(backend.image_to_data(binary))
+    if rows and min(row["confidence"] for row in rows) >= _min_confidence():
+        return rows
+    scale = RETRY_SCALES[0]
+    retry = _parse(backend.image_to_data(
+        _binarize(cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC))))
+    return max(rows, retry, key=lambda r: (len(r), sum(row["confidence"] for row in r) / max(1, len(r))))
+
+def _ink_runs(profile: np.ndarray, min_ink: int, max_gap: int) -> List[tuple]:
+    # intervalles [début, fin) où la projection dépasse min_ink ; les trous <= max_gap sont comblés
+    runs = []
+    for i in np.flatnonzero(profile > min_ink):
+        if runs and i - runs[-1][1] <= max_gap:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+    return [tuple(r) for r in runs]
+
+def _segment(binary: np.ndarray):
+    """
+    Découpe le scoreboard binarisé (texte noir) en lignes puis en colonnes par projections d'encre.
+    Renvoie (lignes [(y1, y2)], colonnes [(x1, x2)]) ; les colonnes sont séparées par un blanc
+    plus large qu'une hauteur de texte, ce qui garde entier un gamertag à espaces.
+    """
+    ink = cv2.medianBlur(binary, 3) == 0            # le médian efface le bruit isolé
+    h, w = ink.shape
+    rows = _ink_runs(ink.sum(axis=1), max(2, w // 200), 1)
+    heights = [y2 - y1 for y1, y2 in rows]
+    if not heights:
+        return [], []
+    text_h = int(np.median(heights))
+    rows = [(y1, y2) for y1, y2 in rows if y2 - y1 >= text_h * 0.5]
+    band = np.zeros(h, bool)
+    for y1, y2 in rows:
+        band[y1:y2] = True
+    columns = _ink_runs(ink[band].sum(axis=0), 0, text_h)
+    # marge verticale : jambages et soulignés, trop fins pour la projection filtrée, sans empiéter sur la ligne voisine
+    pad = max(2, text_h // 3)
+    bounds = [0] + [(a[1] + b[0]) // 2 for a, b in zip(rows, rows[1:])] + [h]
+    rows = [(max(y1 - pad, bounds[i]), min(y2 + pad, bounds[i + 1])) for i, (y1, y2) in enumerate(rows)]
+    return rows, columns
+
+def _cell_box(binary: np.ndarray, y1: int, y2: int, x1: int, x2: int):
+    # cellule recadrée horizontalement sur son encre ; None si vide
+    xs = np.flatnonzero((cv2.medianBlur(binary[y1:y2, x1:x2], 3) == 0).any(axis=0))
+    if not len(xs):
+        return None
+    return y1, y2, x1 + xs.min(), x1 + xs.max() + 1
+
+def _cell_image(binary: np.ndarray, gray: np.ndarray, box, scale: float = 1.0) -> np.ndarray:
+    # échelle 1 : la cellule binarisée telle quelle ; sinon reprise des niveaux de gris agrandis, puis binarisation
+    y1, y2, x1, x2 = box
+    if scale == 1:
+        cell = binary[y1:y2, x1:x2]
+    else:
+        cell = _binarize(cv2.resize(gray[y1:y2, x1:x2], None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC))
+    return cv2.copyMakeBorder(cell, 8, 8, 8, 8, cv2.BORDER_CONSTANT, value=255)
+
+def _read_text(img: np.ndarray, backend, whitelist: str):
+    # (texte, confiance du pire mot) d'une ligne ; confiance 0 si rien n'est lu
+    words = backend.image_to_data(img, psm=PSM_SINGLE_LINE, whitelist=whitelist)
+    if not words:
+        return "", 0.0
+    return " ".join(text for text, _, _ in words), min(conf for _, conf, _ in words)
+
+def _read_cell(binary: np.ndarray, gray: np.ndarray, box, backend, whitelist: str, first=None):
+    """
+    Lit une cellule et ne paie des passes supplémentaires (RETRY_SCALES) que si la confiance
+    reste sous OCR_MIN_CONFIDENCE ; réservé aux backends poolés, où un appel ne relance pas tesseract. `first` : résultat déjà obtenu à l'échelle 1, s'il y en a un.
+    Renvoie la lecture la plus sûre.
+    """
+    best = first or _read_text(_cell_image(binary, gray, box), backend, whitelist)
+    for scale in RETRY_SCALES:
+        if best[0] and best[1] >= _min_confidence():
+            break
+        attempt = _read_text(_cell_image(binary, gray, box, scale), backend, whitelist)
+        if attempt[0] and (not best[0] or attempt[1] > best[1]):
+            best = attempt
+    return best
+
+def _digits(text: str) -> str:
+    return re.sub(r"\D", "", text.translate(_DIGIT_LOOKALIKES))
+
+def _read_numbers(binary: np.ndarray, gray: np.ndarray, boxes: List, backend):
+    """
+    Cellules numériques d'une ligne, lues en un appel : collées côte à côte avec un blanc fixe,
+    en whitelist chiffres. Le LSTM lit mal un chiffre isolé, beaucoup mieux une courte suite.
+    Seules les valeurs peu sûres (ou toutes, si le découpage en mots ne colle pas) sont relues
+    cellule par cellule. Renvoie ([valeur], [confiance]).
+    """
+    present = [box for box in boxes if box is not None]
+    if not present:
+        return [""] * len(boxes), []
+    cells = [_cell_image(binary, gray, box) for box in present]
+    height = max(c.shape[0] for c in cells)
+    gap = np.full((height, height), 255, np.uint8)
+    strip = []
+    for c in cells:
+        strip += [cv2.copyMakeBorder(c, 0, height - c.shape[0], 0, 0, cv2.BORDER_CONSTANT, value=255), gap]
+    words = backend.image_to_data(np.hstack(strip[:-1]), psm=PSM_SINGLE_LINE, whitelist=NUMERIC_WHITELIST + " ")
+    firsts = [(_digits(text), conf) for text, conf, _ in words] if len(words) == len(present) else [None] * len(present)
+
+    read = []
+    for box, first in zip(present, firsts):
+        text, conf = _read_cell(binary, gray, box, backend, NUMERIC_WHITELIST, first)
+        read.append((_digits(text), conf))
+    values = iter(read)
+    out = [next(values) if box is not None else ("", None) for box in boxes]
+    return [v for v, _ in out], [c for _, c in out if c is not None]
+
+def _read_row(binary: np.ndarray, gray: np.ndarray, y1: int, y2: int, columns: List[tuple], backend):
+    # une ligne = gamertag (whitelist complète) puis cellules numériques (chiffres seuls)
+    boxes = [_cell_box(binary, y1, y2, x1, x2) for x1, x2 in columns[:1 + len(STAT_COLUMNS)]]
+    if boxes[0] is None:
+        return None
+    gamertag, confidence = _read_cell(binary, gray, boxes[0], backend, WHITELIST)
+    if not gamertag:
+        return None
+    numbers, confidences = _read_numbers(binary, gray, boxes[1:], backend)
+    return _stats_row(gamertag, numbers, min([confidence, *confidences]))
+
+def _read_table(gray: np.ndarray, backend) -> List[Dict]:
+    """
+    Lecture structurée : une cellule par (ligne, colonne), chacune avec la whitelist de son type,
+    et une confiance par ligne (celle de sa cellule la moins sûre).
+    Les lignes sont lues en parallèle (OCR_ROW_WORKERS) ; avec tesserocr, le parallélisme réel est
+    borné par OCR_ENGINE_POOL_SIZE. Lecture en bloc (_read_block, 2 appels au plus) avec un backend
+    non poolé (environ 2 appels par ligne sinon, soit autant de processus tesseract) ou sans colonnes exploitables.
+    """
+    binary = _binarize(gray)
+    if not backend.pooled:
+        return _read_block(binary, gray, backend)
+    rows, columns = _segment(binary)
+    if len(columns) < 1 + len(REQUIRED_COLUMNS):
+        return _read_block(binary, gray, backend)
+    workers = min(_row_workers(), len(rows))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            out = list(pool.map(lambda r: _read_row(binary, gray, *r, columns, backend), rows))
+    else:
+        out = [_read_row(binary, gray, y1, y2, columns, backend) for y1, y2 in rows]
+    return [row for row in out if row]
+
+def _perceptual_key(gray: np.ndarray, backend=None) -> str:
+    return ocr_cache.perceptual_key(_dhash(gray, settings.OCR_CACHE_PHASH_SIZE), pipeline_fingerprint(backend))
+
+def _recognize(img: np.ndarray, use_cache: bool, cache_keys: List[str], backend=None) -> List[Dict]:
+    backend = backend or get_backend()
+    gray = _scoreboard(img)
+    if use_cache and ocr_cache.perceptual_enabled():
+        key = _perceptual_key(gray, backend)
+        players = ocr_cache.get(key, 'perceptual')
+        if players is not None:
+            ocr_cache.set_many(cache_keys, players)
+            return players
+        cache_keys = cache_keys + [key]
+    players = _read_table(gray, backend)
+    if use_cache and cache_keys:
+        ocr_cache.set_many(cache_keys, players)
+    return players
+
+def extract_from_array(img: np.ndarray, use_cache: bool = True, backend=None) -> List[Dict]:
+    # img : capture complète, BGR (cv2) ou niveaux de gris ; backend : None = celui des settings
+    with timing.phase("ocr"):
+        return _recognize(img, use_cache, [], backend)
+
+def extract_from_bytes(data: bytes, use_cache: bool = True, backend=None) -> List[Dict]:
+    # un hit sur le hash du contenu évite décodage, prétraitement et reconnaissance
+    use_cache = use_cache and ocr_cache.enabled()
+    cache_keys = []
+    with timing.phase("ocr"):
+        if use_cache:
+            key = ocr_cache.content_key(data, pipeline_fingerprint(backend))
+            players = ocr_cache.get(key, 'content')
+            if players is not None:
+                return players
+            cache_keys.append(key)
+        return _recognize(_decode(data), use_cache, cache_keys, backend)
+
+def cached_players(data: bytes, backend=None) -> Optional[List[Dict]]:
+    """
+    Recherche seule (processus web) : hash du contenu, puis hash perceptif si activé.
+    None : capture à lire. Une image illisible n'est pas une erreur ici, le worker la signalera.
+    """
+    content_key = ocr_cache.content_key(data, pipeline_fingerprint(backend))
+    players = ocr_cache.get(content_key, 'content')
+    if players is None and ocr_cache.perceptual_enabled():
+        try:
+            gray = _scoreboard(_decode(data))
+        except ValueError:
+            return None
+        players = ocr_cache.get(_perceptual_key(gray, backend), 'perceptual')
+        if players is not None:
+            ocr_cache.set_many([content_key], players)
+    return players
+
+def read_screenshot(data: bytes, backend=None) -> Tuple[List[Dict], List[str]]:
+    """
+    Lecture sans accès au cache, pour les processus du pool OCR : renvoie les joueurs et les clés
+    sous lesquelles le processus parent les enregistre (jobs.finish_ocr_job).
+    """
+    backend = backend or get_backend()
+    with timing.phase("ocr"):
+        gray = _scoreboard(_decode(data))
+        keys = [ocr_cache.content_key(data, pipeline_fingerprint(backend))]
+        if ocr_cache.perceptual_enabled():
+            keys.append(_perceptual_key(gray, backend))
+        return _read_table(gray, backend), keys
+
 def extract(path: str) -> List[Dict]:
-    prep = _preprocess(path)
-    cfg = f"--psm 6 --oem 3 -c tessedit_char_whitelist={WHITELIST}"
-    txt = pytesseract.image_to_string(Image.open(prep), config=cfg)
-    return _parse(txt)
+    with open(path, "rb") as f:
+        return extract_from_bytes(f.read())
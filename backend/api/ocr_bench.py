@@ -0,0 +1,200 @@
+import logging, random, resource, statistics, time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from . import ocr
+
+logger = logging.getLogger(__name__)
+
+# Banc d'essai du pipeline OCR sur des scoreboards synthétiques dont on connaît le contenu.
+# Utilisé par `manage.py bench_ocr` : débit, latences p50/p95, pic RSS et précision par ligne.
+
+_SYLLABLES = ["ka", "zor", "mi", "tek", "rax", "lu", "vo", "nyx", "dra", "pho", "ghost", "snip", "wolf", "kid"]
+
+
+def random_gamertag(rng: random.Random) -> str:
+    name = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3)))
+    style = rng.random()
+    if style < 0.3:
+        name = name.capitalize()
+    elif style < 0.45:
+        name = name.upper()
+    if rng.random() < 0.3:
+        name = f"{name}_{rng.choice(_SYLLABLES)}"
+    if rng.random() < 0.5:
+        name = f"{name}{rng.randint(0, 99)}"
+    return name
+
+
+def random_rows(rng: random.Random, count: int) -> List[Dict]:
+    tags = set()
+    while len(tags) < count:
+        tags.add(random_gamertag(rng))
+    return [{"gamertag": tag, "kills": rng.randint(0, 30), "revives": rng.randint(0, 9), "deaths": rng.randint(0, 15)}
+            for tag in rng.sample(sorted(tags), count)]
+
+
+def _font(size: int):
+    try:
+        return ImageFont.truetype("DejaVuSans-Bold.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+def render_scoreboard(rows: List[Dict], width: int, height: int, font_scale: float = 1.0,
+                      noise: float = 0.0, seed: int = 0) -> np.ndarray:
+    """
+    Capture BGR façon HUD : fond de jeu bruité, panneau sombre dans la zone CROP,
+    une ligne par joueur (gamertag, kills, réas, morts) en texte clair.
+    """
+    rng = np.random.default_rng(seed)
+    # fond : dégradé + taches de couleur pour imiter la scène de jeu derrière le HUD
+    yy, xx = np.mgrid[0:height, 0:width]
+    base = (60 + 50 * np.sin(xx / width * 3 + rng.uniform(0, 6)) + 40 * np.cos(yy / height * 2)).astype(np.uint8)
+    img = Image.fromarray(np.dstack([base, (base * 0.8).astype(np.uint8), (base * 0.6).astype(np.uint8)]))
+    draw = ImageDraw.Draw(img, "RGBA")
+    for _ in range(12):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        r = int(rng.integers(width // 40, width // 8))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(int(c) for c in rng.integers(0, 255, 3)) + (90,))
+
+    x1, x2 = int(ocr.CROP['x1'] * width), int(ocr.CROP['x2'] * width)
+    y1, y2 = int(ocr.CROP['y1'] * height), int(ocr.CROP['y2'] * height)
+    draw.rectangle((x1, y1, x2, y2), fill=(12, 14, 18, 215))
+
+    font_size = max(8, int(height * 0.024 * font_scale))
+    font = _font(font_size)
+    line_height = int(font_size * 1.9)
+    panel_w = x2 - x1
+    columns = [x1 + int(panel_w * 0.04), x1 + int(panel_w * 0.62), x1 + int(panel_w * 0.75), x1 + int(panel_w * 0.88)]
+    y = y1 + line_height // 2
+    for row in rows:
+        if y + line_height > y2:
+            break
+        values = [row["gamertag"], row["kills"], row["revives"], row["deaths"]]
+        for x, value in zip(columns, values):
+            draw.text((x, y), str(value), font=font, fill=(235, 235, 235, 255))
+        y += line_height
+
+    out = cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+    if noise:
+        out = np.clip(out.astype(np.int16) + rng.normal(0, noise, out.shape).astype(np.int16), 0, 255).astype(np.uint8)
+    return out
+
+
+def rows_fitting(height: int, font_scale: float, wanted: int) -> int:
+    # nombre de lignes que render_scoreboard peut réellement dessiner dans le panneau
+    font_size = max(8, int(height * 0.024 * font_scale))
+    panel_h = int(ocr.CROP['y2'] * height) - int(ocr.CROP['y1'] * height)
+    return max(1, min(wanted, (panel_h - int(font_size * 1.9) // 2) // int(font_size * 1.9)))
+
+
+def row_accuracy(truth: List[Dict], parsed: List[Dict]) -> float:
+    # ligne juste = gamertag exact (casse comprise) + kills + réas exacts
+    expected = {(r["gamertag"], r["kills"], r["revives"]) for r in truth}
+    found = {(r["gamertag"].strip(), r["kills"], r["revives"]) for r in parsed}
+    return len(expected & found) / len(expected) if expected else 1.0
+
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss est en Ko sous Linux ; "children" couvre les processus tesseract lancés par pytesseract
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
+
+
+@dataclass
+class BenchCase:
+    width: int
+    height: int
+    noise: float
+    font_scale: float
+    rows: List[Dict]
+    png: bytes = field(repr=False)
+
+    @property
+    def label(self):
+        return f"{self.width}x{self.height} noise={self.noise:g} font={self.font_scale:g}"
+
+
+def build_cases(resolutions, noises, font_scales, images_per_config: int, rows_per_image: int, seed: int = 0):
+    rng = random.Random(seed)
+    cases = []
+    for width, height in resolutions:
+        for noise in noises:
+            for font_scale in font_scales:
+                for _ in range(images_per_config):
+                    rows = random_rows(rng, rows_fitting(height, font_scale, rows_per_image))
+                    img = render_scoreboard(rows, width, height, font_scale, noise, seed=rng.randrange(2**31))
+                    ok, buf = cv2.imencode(".png", img)
+                    cases.append(BenchCase(width, height, noise, font_scale, rows, buf.tobytes()))
+    return cases
+
+
+class BenchmarkFailed(Exception):
+    """Aucune capture n'a pu être lue : les chiffres du rapport ne mesureraient que l'échec."""
+
+
+def run_benchmark(cases: List[BenchCase], backend) -> Dict:
+    """
+    Passe chaque capture dans ocr.extract_from_bytes (cache désactivé) avec le backend donné.
+    Une capture en erreur compte pour une précision nulle ; les erreurs sont journalisées (trace
+    complète à la première de chaque type) et comptées par type dans le rapport.
+    Lève BenchmarkFailed si toutes les captures échouent.
+    """
+    per_config: Dict[str, Dict] = {}
+    latencies, accuracies, error_types = [], [], Counter()
+    started = time.perf_counter()
+    for case in cases:
+        t0 = time.perf_counter()
+        try:
+            parsed = ocr.extract_from_bytes(case.png, use_cache=False, backend=backend)
+        except Exception as exc:
+            kind = type(exc).__name__
+            if kind in error_types:
+                logger.warning("OCR en échec sur %s (%s) : %s", case.label, kind, exc)
+            else:
+                logger.exception("OCR en échec sur %s (%s)", case.label, kind)
+            parsed = []
+            error_types[kind] += 1
+        elapsed = time.perf_counter() - t0
+        accuracy = row_accuracy(case.rows, parsed)
+        latencies.append(elapsed)
+        accuracies.append(accuracy)
+        bucket = per_config.setdefault(case.label, {"latencies": [], "accuracies": []})
+        bucket["latencies"].append(elapsed)
+        bucket["accuracies"].append(accuracy)
+    total = time.perf_counter() - started
+    errors = sum(error_types.values())
+    if cases and errors == len(cases):
+        details = ", ".join(f"{kind} x{count}" for kind, count in error_types.most_common())
+        raise BenchmarkFailed(f"{backend.name} : les {errors} capture(s) ont échoué ({details})")
+
+    def summary(lat, acc):
+        return {
+            "images": len(lat),
+            "images_per_s": round(len(lat) / sum(lat), 2) if sum(lat) else None,
+            "p50_ms": round(_percentile(lat, 50) * 1000, 1),
+            "p95_ms": round(_percentile(lat, 95) * 1000, 1),
+            "row_accuracy": round(sum(acc) / len(acc), 3),
+        }
+
+    return {
+        "backend": backend.name,
+        "overall": {**summary(latencies, accuracies), "wall_s": round(total, 2),
+                    "errors": errors, "error_types": dict(error_types.most_common())},
+        "configs": {label: summary(b["latencies"], b["accuracies"]) for label, b in per_config.items()},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
@@ -0,0 +1,77 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+# Cache des résultats OCR, sur le framework de cache Django (alias settings.OCR_CACHE_ALIAS).
+# L'éviction est celle du backend configuré : MAX_ENTRIES / TIMEOUT dans CACHES.
+# Les lectures se font côté web (jobs._new_ocr_job), les écritures dans le processus parent du worker
+# (jobs.finish_ocr_job) : les processus du pool ne font que calculer les clés.
+#   - clé "contenu"    : sha256 des octets uploadés (ré-upload du même fichier) ;
+#   - clé "perceptive" : dHash du crop du scoreboard (même capture ré-encodée), optionnelle.
+# Les clés incluent l'empreinte du pipeline OCR : changer le crop, la whitelist ou le backend invalide le cache.
+
+KINDS = ('content', 'perceptual')
+
+
+def enabled():
+    return settings.OCR_CACHE_ENABLED
+
+
+def perceptual_enabled():
+    return settings.OCR_CACHE_ENABLED and settings.OCR_CACHE_PERCEPTUAL
+
+
+def _cache():
+    return caches[settings.OCR_CACHE_ALIAS]
+
+
+def content_key(data: bytes, fingerprint: str) -> str:
+    return f"ocr:{fingerprint}:c:{hashlib.sha256(data).hexdigest()}"
+
+
+def perceptual_key(phash: str, fingerprint: str) -> str:
+    return f"ocr:{fingerprint}:p:{phash}"
+
+
+def _incr(key, delta=1):
+    cache = _cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:          # compteur évincé entre add() et incr()
+        cache.set(key, delta, timeout=None)
+
+
+def _count(kind, hit):
+    _incr(f"ocr:stats:{kind}:{'hits' if hit else 'misses'}")
+
+
+def get(key, kind):
+    players = _cache().get(key)
+    _count(kind, players is not None)
+    metrics.cache_lookup(f"ocr_{kind}", players is not None)
+    return players
+
+
+def set_many(keys, players):
+    if keys:
+        _cache().set_many({key: players for key in keys})
+        _incr("ocr:stats:stores", len(keys))
+
+
+def stats():
+    counters = _cache().get_many(
+        [f"ocr:stats:{kind}:{what}" for kind in KINDS for what in ('hits', 'misses')] + ["ocr:stats:stores"]
+    )
+    out = {'stores': counters.get("ocr:stats:stores", 0)}
+    for kind in KINDS:
+        hits = counters.get(f"ocr:stats:{kind}:hits", 0)
+        misses = counters.get(f"ocr:stats:{kind}:misses", 0)
+        out[kind] = {
+            'hits': hits, 'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return out
@@ -0,0 +1,105 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Pagination par clé (keyset) : la page suivante est filtrée sur la clé de tri de la dernière ligne
+# (WHERE (a, b) > (x, y)) au lieu d'un OFFSET, donc un coût constant quelle que soit la page.
+# Optionnelle pendant la migration du front : sans ?page_size= ni ?cursor=, la liste reste complète.
+
+
+class KeysetPagination(BasePagination):
+    ordering = ('-pk',)               # champs de tri ; le dernier doit rendre la clé unique
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+        self.request = request
+        self.page_size = self._page_size(params)
+        self.model = queryset.model
+        queryset = queryset.order_by(*self.ordering)
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._after(self._decode(cursor)))
+        rows = list(queryset[:self.page_size + 1])
+        self.next_cursor = self._encode(self._key(rows[self.page_size - 1])) if len(rows) > self.page_size else None
+        return rows[:self.page_size]
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def _page_size(self, params):
+        try:
+            size = int(params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _key(self, row):
+        # instance de modèle ou dict issu de .values()
+        if isinstance(row, dict):
+            return [row[name] for name, _ in self._fields()]
+        return [getattr(row, self._model_field(name).attname) if name != 'pk' else row.pk for name, _ in self._fields()]
+
+    def _model_field(self, name):
+        return self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+
+    def _after(self, key):
+        # (a DESC, b ASC) après (x, y)  <=>  a < x OR (a = x AND b > y)
+        condition, equal = Q(), {}
+        for (name, descending), value in zip(self._fields(), key):
+            condition |= Q(**equal, **{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal[name] = value
+        return condition
+
+    def _encode(self, key):
+        # datetimes à la microseconde : DjangoJSONEncoder tronque à la milliseconde, et la page suivante
+        # sauterait alors les lignes créées dans la même milliseconde que la dernière ligne de la page
+        key = [value.isoformat() if isinstance(value, datetime) else value for value in key]
+        return base64.urlsafe_b64encode(json.dumps(key, cls=DjangoJSONEncoder).encode()).decode()
+
+    def _decode(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            key = [self._model_field(name).to_python(value) for (name, _), value in zip(self._fields(), values)]
+            if any(isinstance(value, datetime) and timezone.is_naive(value) for value in key):
+                raise ValueError    # un curseur émis ici porte toujours son fuseau
+            return key
+        except Exception:
+            raise NotFound("Curseur de pagination invalide.")
+
+
+class MasterkillEventPagination(KeysetPagination):
+    ordering = ('-created_at', 'id')
+
+
+class UserPagination(KeysetPagination):
+    ordering = ('username',)          # unique
+
+
+class RankingPagination(KeysetPagination):
+    ordering = ('-total_score', 'player')
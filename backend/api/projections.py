@@ -0,0 +1,114 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+
+from .models import Game, MasterkillEvent
+from .serializers import GameSerializer, current_game_info
+
+# Projections légères des MK pour `?fields=a,b,c` et `?view=summary` (listes, page d'accueil).
+# Les colonnes sont lues par .values() ; une relation (participants, parties, créateur...) n'est
+# chargée que si elle est demandée, en une requête pour tous les MK de la page.
+
+COLUMNS = {
+    'id': 'id', 'name': 'name', 'status': 'status',
+    'created_at': 'created_at', 'effective_start_at': 'effective_start_at', 'ended_at': 'ended_at',
+    'points_kill': 'points_kill', 'points_rea': 'points_rea', 'points_redeploiement': 'points_redeploiement',
+    'points_goulag_win': 'points_goulag_win', 'points_rage_quit': 'points_rage_quit',
+    'points_execution': 'points_execution', 'points_humiliation': 'points_humiliation',
+    'num_games_planned': 'num_games_planned', 'top1_solo_ends_mk': 'top1_solo_ends_mk',
+    'has_bonus_reel': 'has_bonus_reel', 'has_kill_multipliers': 'has_kill_multipliers',
+    'creator': 'creator_id', 'winner': 'winner_id', 'selected_gage': 'selected_gage_id',
+    'selected_gage_text': 'selected_gage__text',
+}
+COUNTS = ('completed_games_count', 'participants_count')
+RELATIONS = ('participants', 'participants_details', 'creator_details', 'winner_details', 'games', 'current_game_info')
+DATETIME_FIELDS = ('created_at', 'effective_start_at', 'ended_at')
+
+FIELDS = (*COLUMNS, *COUNTS, *RELATIONS)
+SUMMARY_FIELDS = ('id', 'name', 'status', 'created_at', 'num_games_planned', 'completed_games_count', 'participants_count')
+
+
+def requested_fields(query_params):
+    """
+    Champs demandés via `?view=summary` ou `?fields=a,b,c` ; None = représentation complète.
+    ValueError si un champ est inconnu.
+    """
+    if query_params.get('view') == 'summary':
+        return list(SUMMARY_FIELDS)
+    raw = query_params.get('fields')
+    if not raw:
+        return None
+    fields = list(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Champ(s) inconnu(s) : {', '.join(unknown) or '(aucun)'}. Champs disponibles : {', '.join(FIELDS)}")
+    return fields
+
+
+def _count_subquery(queryset, key):
+    return Coalesce(Subquery(queryset.order_by().values(key).annotate(n=Count('pk')).values('n')), 0)
+
+
+def _user(user_id, username):
+    return {'id': user_id, 'username': username} if user_id is not None else None
+
+
+def project_events(queryset, fields):
+    """
+    Liste de dicts limités à `fields`, dans l'ordre du queryset.
+    Coût : une requête pour les colonnes et compteurs, plus une par relation demandée.
+    """
+    values = {COLUMNS[f] for f in fields if f in COLUMNS} | {'id', 'status'}
+    if 'creator_details' in fields:
+        values |= {'creator_id', 'creator__username'}
+    if 'winner_details' in fields:
+        values |= {'winner_id', 'winner__username'}
+
+    annotations = {}
+    if 'completed_games_count' in fields:
+        annotations['completed_games_count'] = _count_subquery(
+            Game.objects.filter(masterkill_event=OuterRef('pk'), status='completed'), 'masterkill_event')
+    if 'participants_count' in fields:
+        through = MasterkillEvent.participants.through
+        annotations['participants_count'] = _count_subquery(
+            through.objects.filter(masterkillevent=OuterRef('pk')), 'masterkillevent')
+    rows = list(queryset.annotate(**annotations).values(*values, *annotations))
+    ids = [row['id'] for row in rows]
+
+    participants = {}
+    if {'participants', 'participants_details'} & set(fields):
+        through = MasterkillEvent.participants.through
+        for event_id, user_id, username in (through.objects.filter(masterkillevent_id__in=ids)
+                                            .order_by('pk').values_list('masterkillevent_id', 'user_id', 'user__username')):
+            participants.setdefault(event_id, []).append({'id': user_id, 'username': username})
+
+    games = {}
+    if {'games', 'current_game_info'} & set(fields):
+        for game in Game.objects.filter(masterkill_event_id__in=ids).select_related('squad_leader').order_by('game_number'):
+            games.setdefault(game.masterkill_event_id, []).append(game)
+
+    datetime_field = serializers.DateTimeField()
+    out = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            if field in DATETIME_FIELDS:
+                item[field] = datetime_field.to_representation(row[field]) if row[field] else None
+            elif field in COLUMNS:
+                item[field] = row[COLUMNS[field]]
+            elif field in COUNTS:
+                item[field] = row[field]
+            elif field == 'participants':
+                item[field] = [user['id'] for user in participants.get(row['id'], [])]
+            elif field == 'participants_details':
+                item[field] = participants.get(row['id'], [])
+            elif field == 'creator_details':
+                item[field] = _user(row['creator_id'], row['creator__username'])
+            elif field == 'winner_details':
+                item[field] = _user(row['winner_id'], row['winner__username'])
+            elif field == 'games':
+                item[field] = GameSerializer(games.get(row['id'], []), many=True).data
+            elif field == 'current_game_info':
+                item[field] = current_game_info(row['id'], row['status'], games.get(row['id'], []))
+        out.append(item)
+    return out
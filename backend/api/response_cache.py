@@ -0,0 +1,56 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+# Cache des réponses des endpoints de stats d'un événement (aggregated-stats, game-scores, kills-by-spawn),
+# sur l'alias settings.STATS_CACHE_ALIAS.
+#   - clé = nom de la vue + ETag de l'événement (api.conditional.event_validators), que ces vues lisent
+#     de toute façon pour les GET conditionnels : toute écriture qui change l'ETag change la clé,
+#     sans version à tenir ni invalidation à faire après les écritures ;
+#   - les anciennes entrées ne sont plus jamais lues et expirent seules (TIMEOUT / MAX_ENTRIES) ;
+#   - single-flight : sur un miss, un seul appelant recalcule, les autres attendent son résultat.
+# La clé venant de la base, un cache propre à chaque processus (LocMemCache, le défaut) ne sert jamais
+# d'état périmé : il coûte seulement un recalcul par processus. Un Redis partagé évite ces recalculs ;
+# DatabaseCache coûterait plus de requêtes que les lectures qu'il remplace.
+
+
+def _cache():
+    return caches[settings.STATS_CACHE_ALIAS]
+
+
+def cached(validators, name, compute):
+    """
+    Renvoie compute() mis en cache pour (name, ETag de l'événement) ; sans validateurs (événement
+    introuvable), compute() directement.
+    Sur un miss, seul le détenteur du verrou recalcule ; les autres attendent jusqu'à
+    STATS_CACHE_LOCK_WAIT secondes puis calculent eux-mêmes (le verrou a pu expirer ou son détenteur échouer).
+    """
+    if validators is None:
+        return compute()
+    etag, _ = validators
+    cache = _cache()
+    key = f"stats:{name}:{hashlib.sha1(etag.encode()).hexdigest()[:20]}"
+    data = cache.get(key)
+    metrics.cache_lookup('stats', data is not None)
+    if data is not None:
+        return data
+
+    lock = f"{key}:lock"
+    if not cache.add(lock, 1, timeout=settings.STATS_CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + settings.STATS_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            data = cache.get(key)
+            if data is not None:
+                return data
+        return compute()
+    try:
+        data = compute()
+        cache.set(key, data)
+        return data
+    finally:
+        cache.delete(lock)
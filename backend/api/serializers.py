@@ -1,6 +1,8 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Gage, MasterkillEvent, Player, Game, GamePlayerStats, RedeployEvent, ReviveEvent
+from django.db.models import Count, Prefetch, Q
+from .models import Gage, MasterkillEvent, Player, Game, GamePlayerStats, RedeployEvent, ReviveEvent, OCRJob
 
 class PlayerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -37,6 +39,22 @@ class GameSerializer(serializers.ModelSerializer):
             # squad_leader (ID) peut être défini lors de la création/maj d'une partie
         ]
 
+def current_game_info(mk_event_id, mk_status, games):
+    # games : parties du MK triées par game_number
+    # Le GameSerializer utilisé ici remontera maintenant squad_leader_username
+    current_inprogress_game = next((g for g in games if g.status == 'inprogress'), None)
+    if current_inprogress_game:
+        return GameSerializer(current_inprogress_game).data
+
+    next_pending_game = next((g for g in games if g.status == 'pending'), None)
+    if next_pending_game:
+        return GameSerializer(next_pending_game).data
+
+    if mk_status == 'pending' and not games:
+        # Pour un MK pending sans partie, current_game_info peut inclure des valeurs par défaut
+        return {'game_number': 1, 'status': 'pending', 'id': None, 'masterkill_event': mk_event_id, 'kill_multiplier': 1.0, 'spawn_location': None, 'squad_leader': None, 'squad_leader_username': None}
+    return None
+
 class MasterkillEventSerializer(serializers.ModelSerializer):
     # MODIFIÉ: Utiliser UserSerializer pour participants_details car participants pointe vers User
     participants_details = UserSerializer(source='participants', many=True, read_only=True)
@@ -61,6 +79,7 @@ class MasterkillEventSerializer(serializers.ModelSerializer):
     current_game_info = serializers.SerializerMethodField(read_only=True)
     games = GameSerializer(many=True, read_only=True)
     completed_games_count = serializers.SerializerMethodField(read_only=True)
+    live_stream = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = MasterkillEvent
@@ -75,7 +94,7 @@ class MasterkillEventSerializer(serializers.ModelSerializer):
             'status', 'winner', 'winner_details',
             'participants', 'participants_details', 
             'participant_ids', 
-            'current_game_info', 'games', 'completed_games_count'
+            'current_game_info', 'games', 'completed_games_count', 'live_stream'
         ]
         read_only_fields = [
             'creator', 
@@ -86,27 +105,31 @@ class MasterkillEventSerializer(serializers.ModelSerializer):
             'current_game_info', 
             'games', 
             'completed_games_count',
+            'live_stream',
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Plan de chargement pour les listes / détails : nombre de requêtes fixe quel que soit le nombre de MK
+        return queryset.select_related('creator', 'winner', 'selected_gage').prefetch_related(
+            Prefetch('games', queryset=Game.objects.select_related('squad_leader').order_by('game_number')),
+            'participants',
+        ).annotate(
+            completed_games_total=Count('games', filter=Q(games__status='completed')),
+        )
+
     def get_completed_games_count(self, obj):
-        if hasattr(obj, 'games'):
-            return obj.games.filter(status='completed').count()
-        return 0
+        if hasattr(obj, 'completed_games_total'):
+            return obj.completed_games_total
+        return obj.games.filter(status='completed').count()
+
+    def get_live_stream(self, obj):
+        # flux SSE disponible (serveur ASGI) : le client peut l'ouvrir au lieu de recharger en boucle
+        return settings.LIVE_EVENTS_ENABLED
 
     def get_current_game_info(self, obj):
-        # Le GameSerializer utilisé ici remontera maintenant squad_leader_username
-        current_inprogress_game = obj.games.filter(status='inprogress').order_by('game_number').first()
-        if current_inprogress_game:
-            return GameSerializer(current_inprogress_game).data
-        
-        next_pending_game = obj.games.filter(status='pending').order_by('game_number').first()
-        if next_pending_game:
-            return GameSerializer(next_pending_game).data
-        
-        if obj.status == 'pending' and not Game.objects.filter(masterkill_event_id=obj.id).exists():
-            # Pour un MK pending sans partie, current_game_info peut inclure des valeurs par défaut
-            return {'game_number': 1, 'status': 'pending', 'id': None, 'masterkill_event': obj.id, 'kill_multiplier': 1.0, 'spawn_location': None, 'squad_leader': None, 'squad_leader_username': None}
-        return None
+        # Les parties préchargées (setup_eager_loading) sont triées par game_number : aucun accès base ici
+        return current_game_info(obj.id, obj.status, list(obj.games.all()))
 
     def _handle_participants(self, instance, participant_ids):
         if participant_ids is not None:
@@ -210,6 +233,12 @@ class GamePlayerStatsSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'game', 'score_in_game', 'player_username']
 
+class OCRJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OCRJob
+        fields = ['id', 'game', 'status', 'players', 'error', 'created_at', 'started_at', 'finished_at', 'applied_at']
+        read_only_fields = fields
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
     password_confirm = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'}, label="Confirm password")
@@ -250,9 +279,9 @@ class AggregatedPlayerStatsSerializer(serializers.Serializer):
     games_played_in_mk = serializers.IntegerField(default=0)
     
 class AllTimePlayerStatsSerializer(serializers.Serializer):
-    # CORRIGÉ: player_id et gamertag devraient se référer à User.id et User.username
-    player_id = serializers.IntegerField(source='id') # En supposant que la source est un objet User
-    username = serializers.CharField(source='username') # Anciennement gamertag
+    # Source : une ligne de PlayerLifetimeStats (avec select_related('player'))
+    player_id = serializers.IntegerField()
+    username = serializers.CharField(source='player.username') # Anciennement gamertag
     total_score = serializers.IntegerField()
     total_kills = serializers.IntegerField()
     total_deaths = serializers.IntegerField()
@@ -0,0 +1,447 @@
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import (
+    Sum, Count, Q, F, Func, OuterRef, Subquery, IntegerField, FloatField, Window, Case, When, Value, ExpressionWrapper
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import MasterkillEvent, Game, GamePlayerStats, ReviveEvent, PlayerLifetimeStats
+
+# Colonnes saisies en fin de partie (hors score, qui en est dérivé)
+GAME_STATS_FIELDS = [
+    'kills', 'deaths', 'assists', 'gulag_status', 'revives_done',
+    'times_executed_enemy', 'times_got_executed', 'rage_quit', 'times_redeployed_by_teammate',
+]
+
+
+def compute_game_score(mk_event, kill_multiplier, *, kills=0, revives=0, gulag_status='not_played',
+                       times_redeployed_by_teammate=0, rage_quit=False,
+                       times_executed_enemy=0, times_got_executed=0, **_):
+    # Barème du Masterkill appliqué aux stats d'un joueur pour une partie
+    score = 0
+    score += (kills * mk_event.points_kill * kill_multiplier)
+    score += revives * mk_event.points_rea
+    if gulag_status == 'won':
+        score += mk_event.points_goulag_win
+    score += times_redeployed_by_teammate * mk_event.points_redeploiement
+    if rage_quit:
+        score += mk_event.points_rage_quit
+    score += times_executed_enemy * mk_event.points_execution
+    score += times_got_executed * mk_event.points_humiliation
+    return int(score)
+
+
+# Barème d'un Masterkill : le modifier rend obsolètes les score_in_game déjà stockés (voir rescore_events)
+SCORING_FIELDS = [
+    'points_kill', 'points_rea', 'points_redeploiement', 'points_goulag_win',
+    'points_rage_quit', 'points_execution', 'points_humiliation',
+]
+
+
+class TruncateToZero(Func):
+    # int() de Python : troncature vers zéro (CAST arrondit sous PostgreSQL, tronque sous SQLite)
+    function = 'TRUNC'
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='CAST(%(expressions)s AS INTEGER)', **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='TRUNCATE(%(expressions)s, 0)', **extra_context)
+
+
+def game_revives_subquery():
+    # Réas enregistrées pendant la partie par le joueur de la ligne GamePlayerStats externe (comme EndGameAPIView)
+    return Coalesce(Subquery(
+        ReviveEvent.objects.filter(game_id=OuterRef('game_id'), reviver_player_id=OuterRef('player_id'))
+        .order_by().values('game_id').annotate(n=Count('id')).values('n')[:1]
+    ), 0)
+
+
+def score_expression(mk_event, kill_multiplier):
+    """
+    compute_game_score() traduit en expression SQL sur les colonnes de GamePlayerStats, pour les parties
+    de `mk_event` jouées avec `kill_multiplier` : barème et multiplicateur passés en constantes.
+    Les deux doivent rester alignés : `manage.py rescore_games --check-only` les compare.
+    """
+    def rule(field):
+        return Value(getattr(mk_event, field))
+
+    return TruncateToZero(ExpressionWrapper(
+        F('kills') * rule('points_kill') * Value(kill_multiplier)
+        + game_revives_subquery() * rule('points_rea')
+        + Case(When(gulag_status='won', then=rule('points_goulag_win')), default=Value(0))
+        + F('times_redeployed_by_teammate') * rule('points_redeploiement')
+        + Case(When(rage_quit=True, then=rule('points_rage_quit')), default=Value(0))
+        + F('times_executed_enemy') * rule('points_execution')
+        + F('times_got_executed') * rule('points_humiliation'),
+        output_field=FloatField(),
+    ))
+
+
+def scored_rows(mk_events=None):
+    # Parties terminées hors roue des bonus (score_in_game y est le bonus lui-même, pas un calcul)
+    rows = GamePlayerStats.objects.filter(
+        game__status='completed',
+        game__game_number__lt=F('game__masterkill_event__num_games_planned') + 1000,
+    ).exclude(game__spawn_location='BonusRoue')
+    return rows if mk_events is None else rows.filter(game__masterkill_event__in=mk_events)
+
+
+def rescore_events(mk_events=None):
+    """
+    Recalcule score_in_game des parties jouées avec le barème actuel de leur événement, pour les événements
+    donnés (tout l'historique si None) : un UPDATE par couple (événement, multiplicateur de kills),
+    le plus souvent un seul par événement. Renvoie le nombre de lignes recalculées.
+    PlayerLifetimeStats est à rafraîchir par l'appelant.
+    """
+    groups = list(
+        scored_rows(mk_events).order_by()
+        .values_list('game__masterkill_event_id', 'game__kill_multiplier').distinct()
+    )
+    if not groups:
+        return 0
+    if mk_events is None:
+        events = MasterkillEvent.objects.in_bulk({event_id for event_id, _ in groups})
+    else:
+        events = {mk_event.pk: mk_event for mk_event in mk_events}
+    updated = 0
+    for event_id, kill_multiplier in groups:
+        mk_event = events[event_id]
+        updated += scored_rows().filter(game__masterkill_event=mk_event, game__kill_multiplier=kill_multiplier).update(
+            score_in_game=score_expression(mk_event, kill_multiplier)
+        )
+    # change les validateurs ETag (api.conditional), donc aussi les clés des réponses en cache
+    MasterkillEvent.objects.filter(pk__in=events).update(updated_at=timezone.now())
+    return updated
+
+
+def increment_game_stats(game_id, deltas):
+    """
+    Ajoute des deltas aux compteurs GamePlayerStats d'une partie : deltas = {player_id: {champ: n}}.
+    Une seule requête (INSERT ... ON CONFLICT DO UPDATE SET c = c + excluded.c RETURNING ...) : les lignes
+    manquantes sont créées et des incréments simultanés ne peuvent pas s'écraser.
+    Renvoie {player_id: {champ: nouvelle valeur}}.
+    """
+    if not deltas:
+        return {}
+    names = sorted({name for counts in deltas.values() for name in counts})
+    features = connection.features
+    if not (features.supports_update_conflicts_with_target and features.can_return_columns_from_insert):
+        # bases sans upsert RETURNING : UPDATE atomique par joueur, création si la ligne n'existe pas encore
+        for player_id, counts in deltas.items():
+            rows = GamePlayerStats.objects.filter(game_id=game_id, player_id=player_id)
+            increments = {name: F(name) + n for name, n in counts.items()}
+            if not rows.update(**increments):
+                _, created = GamePlayerStats.objects.get_or_create(game_id=game_id, player_id=player_id, defaults=counts)
+                if not created:
+                    rows.update(**increments)
+        return {
+            row['player_id']: {name: row[name] for name in names}
+            for row in GamePlayerStats.objects.filter(game_id=game_id, player_id__in=deltas).values('player_id', *names)
+        }
+
+    opts = GamePlayerStats._meta
+    qn = connection.ops.quote_name
+    fields = [f for f in opts.concrete_fields if not f.primary_key]
+    table = qn(opts.db_table)
+    columns = [qn(opts.get_field(name).column) for name in names]
+    params = []
+    for player_id, counts in deltas.items():
+        values = {f.attname: f.get_default() for f in fields}
+        values.update({'game_id': game_id, 'player_id': player_id, **counts})
+        params.extend(f.get_db_prep_save(values[f.attname], connection) for f in fields)
+    row_sql = f"({', '.join(['%s'] * len(fields))})"
+    player_column = qn(opts.get_field('player').column)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(f.column) for f in fields)}) VALUES {', '.join([row_sql] * len(deltas))} "
+        f"ON CONFLICT ({qn(opts.get_field('game').column)}, {player_column}) "
+        f"DO UPDATE SET {', '.join(f'{c} = {table}.{c} + excluded.{c}' for c in columns)} "
+        f"RETURNING {player_column}, {', '.join(columns)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {player_id: dict(zip(names, counts)) for player_id, *counts in cursor.fetchall()}
+
+
+def increment_game_stat(game_id, player_id, field_name):
+    # un seul compteur d'un seul joueur : renvoie sa nouvelle valeur
+    return increment_game_stats(game_id, {player_id: {field_name: 1}})[player_id][field_name]
+
+
+# Agrégats calculés en une seule requête groupée (un GROUP BY sur les joueurs),
+# au lieu d'un aggregate() + un count() par participant.
+
+
+def _revives_subquery(**game_filters):
+    # Nombre de réanimations effectuées par le joueur de la ligne externe
+    revives = ReviveEvent.objects.filter(
+        reviver_player=OuterRef('pk'), **game_filters
+    ).order_by().values('reviver_player').annotate(c=Count('pk')).values('c')
+    return Coalesce(Subquery(revives, output_field=IntegerField()), 0)
+
+
+def event_player_totals(mk_event):
+    """
+    Totaux par participant sur les parties terminées d'un Masterkill.
+    Nombre de requêtes constant, quel que soit le nombre de joueurs ou de parties.
+    """
+    in_event = Q(game_stats__game__masterkill_event=mk_event, game_stats__game__status='completed')
+    users = User.objects.filter(
+        masterkill_events_participated=mk_event
+    ).annotate(
+        total_kills=Sum('game_stats__kills', filter=in_event, default=0),
+        total_deaths=Sum('game_stats__deaths', filter=in_event, default=0),
+        total_assists=Sum('game_stats__assists', filter=in_event, default=0),
+        total_gulag_wins=Count('game_stats', filter=in_event & Q(game_stats__gulag_status='won')),
+        total_gulag_lost=Count('game_stats', filter=in_event & Q(game_stats__gulag_status='lost')),
+        total_times_executed_enemy=Sum('game_stats__times_executed_enemy', filter=in_event, default=0),
+        total_times_got_executed=Sum('game_stats__times_got_executed', filter=in_event, default=0),
+        total_rage_quits=Count('game_stats', filter=in_event & Q(game_stats__rage_quit=True)),
+        total_times_redeployed_by_teammate=Sum('game_stats__times_redeployed_by_teammate', filter=in_event, default=0),
+        total_score_from_games=Sum('game_stats__score_in_game', filter=in_event, default=0),
+        games_played_in_mk=Count('game_stats__game', filter=in_event, distinct=True),
+        total_revives_done=_revives_subquery(game__masterkill_event=mk_event, game__status='completed'),
+    ).order_by('id')
+
+    return [
+        {
+            'player': user,
+            'total_kills': user.total_kills,
+            'total_deaths': user.total_deaths,
+            'total_assists': user.total_assists,
+            'total_gulag_wins': user.total_gulag_wins,
+            'total_gulag_lost': user.total_gulag_lost,
+            'total_revives_done': user.total_revives_done,
+            'total_times_executed_enemy': user.total_times_executed_enemy,
+            'total_times_got_executed': user.total_times_got_executed,
+            'total_rage_quits': user.total_rage_quits,
+            'total_times_redeployed_by_teammate': user.total_times_redeployed_by_teammate,
+            'total_score_from_games': user.total_score_from_games,
+            'games_played_in_mk': user.games_played_in_mk,
+        }
+        for user in users
+    ]
+
+
+
+def event_score_matrix(mk_event, participant_ids):
+    """
+    Scores cumulés partie par partie pour chaque participant, à partir d'une seule lecture
+    des lignes (joueur, numéro de partie, score). Les parties de la roue des bonus
+    (game_number >= num_games_planned + 1000) forment une série à part.
+    """
+    bonus_from = mk_event.num_games_planned + 1000
+    completed_numbers = list(
+        mk_event.games.filter(status='completed').order_by('game_number').values_list('game_number', flat=True)
+    )
+    game_numbers = [n for n in completed_numbers if n < bonus_from]
+    bonus_numbers = [n for n in completed_numbers if n >= bonus_from]
+
+    rows = GamePlayerStats.objects.filter(
+        game__masterkill_event=mk_event, game__status='completed', player_id__in=participant_ids,
+    )
+    use_window = connection.features.supports_over_clause
+    if use_window:
+        # SUM() OVER (PARTITION BY player ORDER BY game_number) : le cumul est fait par la base
+        rows = rows.annotate(cumulative=Window(
+            Sum('score_in_game'), partition_by=[F('player_id')], order_by=F('game__game_number').asc(),
+        ))
+    else:
+        rows = rows.annotate(cumulative=F('score_in_game'))
+    scores = {
+        (player_id, game_number): (score, cumulative)
+        for player_id, game_number, score, cumulative
+        in rows.values_list('player_id', 'game__game_number', 'score_in_game', 'cumulative')
+    }
+
+    player_scores, bonus_scores = {}, {}
+    for player_id in participant_ids:
+        cumulative_score, series = 0, []
+        for game_number in game_numbers:
+            score, cumulative = scores.get((player_id, game_number), (0, None))
+            if use_window and cumulative is not None:
+                cumulative_score = cumulative
+            else:
+                cumulative_score += score
+            series.append(cumulative_score)
+        player_scores[str(player_id)] = series
+
+        bonus_total, bonus_series = 0, []
+        for game_number in bonus_numbers:
+            bonus_total += scores.get((player_id, game_number), (0, None))[0]
+            bonus_series.append(bonus_total)
+        bonus_scores[str(player_id)] = bonus_series
+
+    return {
+        'player_scores_per_game': player_scores,
+        'num_games_played': len(game_numbers),
+        'bonus_scores_per_game': bonus_scores,
+        'num_bonus_games': len(bonus_numbers),
+    }
+
+# Classement all-time (PlayerLifetimeStats) : totaux additifs, tenus à jour par deltas.
+# Une écriture calcule la contribution des seules parties qu'elle touche (game_contributions) et
+# l'ajoute aux lignes des joueurs (apply_lifetime_deltas) : le coût ne dépend pas de leur historique.
+# `manage.py rebuild_lifetime_stats` recalcule tout depuis les parties : réparation et vérification.
+LIFETIME_FIELDS = [
+    'total_score', 'total_kills', 'total_deaths', 'total_assists', 'total_revives_done',
+    'total_gulag_wins', 'total_rage_quits', 'total_times_redeployed',
+    'games_played', 'mks_won',
+]
+# tout sauf mks_won, qui dépend des événements et non des parties
+GAME_LIFETIME_FIELDS = LIFETIME_FIELDS[:-1]
+
+
+def _lifetime_rows(player_ids=None, with_mks_won=False, **game_filters):
+    # une requête groupée sur les parties terminées (filtrées par game_filters, lookups sur Game)
+    completed = Q(game_stats__game__status='completed', **{f'game_stats__game__{k}': v for k, v in game_filters.items()})
+    users = User.objects.all()
+    if player_ids is not None:
+        users = users.filter(id__in=player_ids)
+    if game_filters:
+        users = users.filter(id__in=GamePlayerStats.objects.filter(
+            game__status='completed', **{f'game__{k}': v for k, v in game_filters.items()}).values('player_id'))
+    annotations = dict(
+        total_score=Sum('game_stats__score_in_game', filter=completed, default=0),
+        total_kills=Sum('game_stats__kills', filter=completed, default=0),
+        total_deaths=Sum('game_stats__deaths', filter=completed, default=0),
+        total_assists=Sum('game_stats__assists', filter=completed, default=0),
+        total_gulag_wins=Count('game_stats', filter=completed & Q(game_stats__gulag_status='won')),
+        total_rage_quits=Count('game_stats', filter=completed & Q(game_stats__rage_quit=True)),
+        total_times_redeployed=Sum('game_stats__times_redeployed_by_teammate', filter=completed, default=0),
+        games_played=Count('game_stats__game', filter=completed, distinct=True),
+        total_revives_done=_revives_subquery(game__status='completed', **{f'game__{k}': v for k, v in game_filters.items()}),
+    )
+    if with_mks_won:
+        mks_won = MasterkillEvent.objects.filter(
+            winner=OuterRef('pk'), status='completed'
+        ).order_by().values('winner').annotate(c=Count('pk')).values('c')
+        annotations['mks_won'] = Coalesce(Subquery(mks_won, output_field=IntegerField()), 0)
+    rows = users.annotate(**annotations).filter(games_played__gt=0).values(
+        'id', *(LIFETIME_FIELDS if with_mks_won else GAME_LIFETIME_FIELDS))
+    return {row.pop('id'): row for row in rows}
+
+
+def lifetime_totals(player_ids=None):
+    """
+    Agrégats all-time calculés en direct (parties terminées uniquement), en une requête groupée.
+    Seuls les joueurs ayant au moins une partie terminée sont renvoyés.
+    """
+    return _lifetime_rows(player_ids, with_mks_won=True)
+
+
+def game_contributions(player_ids=None, **game_filters):
+    """
+    Part des parties terminées filtrées (pk=..., masterkill_event=...) dans les totaux all-time,
+    par joueur, lue sur ces seules parties.
+    """
+    return _lifetime_rows(player_ids, **game_filters)
+
+
+def merge_deltas(*deltas):
+    # somme champ par champ de plusieurs {player_id: {champ: n}}
+    merged = {}
+    for delta in deltas:
+        for player_id, counts in delta.items():
+            target = merged.setdefault(player_id, {})
+            for name, n in counts.items():
+                target[name] = target.get(name, 0) + n
+    return merged
+
+
+def negate_deltas(deltas):
+    return {player_id: {name: -n for name, n in counts.items()} for player_id, counts in deltas.items()}
+
+
+def mks_won_deltas(before, after):
+    # (winner_id, status) d'un événement avant / après l'écriture : une victoire ne compte qu'une fois le MK terminé
+    deltas = {}
+    for (winner_id, mk_status), n in ((before, -1), (after, 1)):
+        if winner_id is not None and mk_status == 'completed':
+            deltas = merge_deltas(deltas, {winner_id: {'mks_won': n}})
+    return deltas
+
+
+def apply_lifetime_deltas(deltas):
+    """
+    Ajoute deltas = {player_id: {champ: n}} aux lignes de PlayerLifetimeStats, en un UPDATE.
+    À appeler après l'écriture, dans sa transaction. Un joueur sans ligne (première partie terminée)
+    a sa ligne calculée en entier ; une ligne retombée à zéro partie est supprimée, comme dans lifetime_totals().
+    """
+    deltas = {
+        player_id: {name: n for name, n in counts.items() if n}
+        for player_id, counts in deltas.items() if player_id is not None
+    }
+    deltas = {player_id: counts for player_id, counts in deltas.items() if counts}
+    if not deltas:
+        return
+    rows = PlayerLifetimeStats.objects.filter(player_id__in=deltas)
+    names = sorted({name for counts in deltas.values() for name in counts})
+    updated = rows.update(updated_at=timezone.now(), **{
+        name: F(name) + Case(
+            *[When(player_id=player_id, then=Value(counts[name])) for player_id, counts in deltas.items() if name in counts],
+            default=Value(0),
+        )
+        for name in names
+    })
+    if updated < len(deltas):
+        refresh_lifetime_stats(set(deltas) - set(rows.values_list('player_id', flat=True)))
+    if any(counts.get('games_played', 0) < 0 for counts in deltas.values()):
+        rows.filter(games_played=0).delete()
+
+
+@contextmanager
+def lifetime_delta(player_ids=None, **game_filters):
+    """
+    Pour une écriture sur des parties peut-être déjà terminées : leur contribution est lue avant
+    et après le bloc, seule la différence est appliquée à PlayerLifetimeStats.
+    """
+    before = game_contributions(player_ids, **game_filters)
+    yield
+    apply_lifetime_deltas(merge_deltas(game_contributions(player_ids, **game_filters), negate_deltas(before)))
+
+
+@contextmanager
+def completed_game_write(game, player_ids):
+    """
+    Écriture tardive sur une partie (réa / redéploiement après la fin, OCR appliqué ensuite) : si elle est
+    déjà terminée, score_in_game des joueurs touchés est recalculé à la sortie du bloc et l'écart
+    (score et compteurs) reporté sur PlayerLifetimeStats. Sans effet sur une partie en cours.
+    """
+    if game.status != 'completed':
+        yield
+        return
+    player_ids = list(player_ids)
+    with lifetime_delta(player_ids, pk=game.pk):
+        yield
+        scored_rows().filter(game_id=game.pk, player_id__in=player_ids).update(
+            score_in_game=score_expression(game.masterkill_event, game.kill_multiplier)
+        )
+
+
+def refresh_lifetime_stats(player_ids=None):
+    """
+    Recalcule entièrement les lignes de PlayerLifetimeStats des joueurs donnés (tous si None).
+    Réparation et nouvelles lignes ; les écritures courantes passent par apply_lifetime_deltas().
+    """
+    if player_ids is not None:
+        player_ids = {pid for pid in player_ids if pid is not None}
+        if not player_ids:
+            return
+    with transaction.atomic():
+        totals = lifetime_totals(player_ids)
+        stale = PlayerLifetimeStats.objects.exclude(player_id__in=list(totals))
+        if player_ids is not None:
+            stale = stale.filter(player_id__in=player_ids)
+        stale.delete()
+        if totals:
+            PlayerLifetimeStats.objects.bulk_create(
+                [PlayerLifetimeStats(player_id=pid, **row) for pid, row in totals.items()],
+                update_conflicts=True,
+                unique_fields=['player'],
+                update_fields=LIFETIME_FIELDS + ['updated_at'],
+            )
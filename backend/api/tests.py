@@ -1,3 +1,936 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import threading
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cv2
+import numpy as np
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date
+from rest_framework.test import APITestCase
+
+from . import live, ocr, ocr_cache
+from .conditional import touch_game
+from .jobs import _apply_players, batch_status, claim_ocr_jobs, finish_ocr_job, merge_batch_players, requeue_stale_ocr_jobs
+from .matching import GamertagMatcher, normalize_gamertag, resolve_players
+from .models import MasterkillEvent, Game, GamePlayerStats, RedeployEvent, ReviveEvent, PlayerLifetimeStats, OCRJob
+from .ocr import TesserocrBackend, extract_from_bytes, pipeline_fingerprint
+from .ocr_bench import BenchmarkFailed, build_cases, rows_fitting, run_benchmark
+from .projections import SUMMARY_FIELDS
+from .stats import (
+    compute_game_score, event_player_totals, event_score_matrix, increment_game_stats, lifetime_totals, rescore_events,
+)
+from .timing import ServerTimingMiddleware, phase
+
+
+def make_users(count, prefix="joueur"):
+    return [User.objects.create(username=f"{prefix}{i}") for i in range(count)]
+
+
+def make_event(participants, **fields):
+    mk_event = MasterkillEvent.objects.create(status='inprogress', **fields)
+    mk_event.participants.set(participants)
+    return mk_event
+
+
+def play_game(mk_event, game_number, stats, revives=(), status='completed', kill_multiplier=1.0):
+    """
+    Partie avec ses GamePlayerStats, scorées comme EndGameAPIView.
+    stats = {user: {champ: valeur}}, revives = [(réanimateur, réanimé)].
+    """
+    game = Game.objects.create(masterkill_event=mk_event, game_number=game_number, status=status, kill_multiplier=kill_multiplier)
+    for reviver, revived in revives:
+        ReviveEvent.objects.create(game=game, reviver_player=reviver, revived_player=revived)
+    for user, fields in stats.items():
+        revives_done = sum(1 for reviver, _ in revives if reviver == user)
+        GamePlayerStats.objects.create(
+            game=game, player=user, revives_done=revives_done,
+            score_in_game=compute_game_score(mk_event, kill_multiplier, revives=revives_done, **fields), **fields,
+        )
+    return game
+
+
+class EventPlayerTotalsTests(TestCase):
+    def test_totals_per_participant(self):
+        alice, bob = make_users(2)
+        mk_event = make_event([alice, bob], points_kill=2)
+        play_game(mk_event, 1, {alice: {'kills': 3, 'deaths': 1, 'gulag_status': 'won'}, bob: {'kills': 1, 'deaths': 2}},
+                  revives=[(alice, bob), (alice, bob)])
+        play_game(mk_event, 2, {alice: {'kills': 2, 'rage_quit': True}, bob: {'kills': 4, 'gulag_status': 'lost'}})
+        # partie en cours : ignorée
+        play_game(mk_event, 3, {alice: {'kills': 50}}, revives=[(alice, bob)], status='inprogress')
+
+        totals = {row['player'].id: row for row in event_player_totals(mk_event)}
+        self.assertEqual(totals[alice.id]['total_kills'], 5)
+        self.assertEqual(totals[alice.id]['total_revives_done'], 2)
+        self.assertEqual(totals[alice.id]['total_gulag_wins'], 1)
+        self.assertEqual(totals[alice.id]['total_rage_quits'], 1)
+        self.assertEqual(totals[alice.id]['games_played_in_mk'], 2)
+        self.assertEqual(totals[bob.id]['total_gulag_lost'], 1)
+        self.assertEqual(totals[bob.id]['total_score_from_games'], sum(
+            GamePlayerStats.objects.filter(player=bob, game__status='completed').values_list('score_in_game', flat=True)))
+
+    def test_single_query_whatever_the_event_size(self):
+        users = make_users(8)
+        small = make_event(users[:2])
+        play_game(small, 1, {u: {'kills': 1} for u in users[:2]})
+        large = make_event(users)
+        for number in range(1, 6):
+            play_game(large, number, {u: {'kills': number} for u in users}, revives=[(users[0], users[1])])
+
+        for mk_event in (small, large):
+            with self.assertNumQueries(1):
+                event_player_totals(mk_event)
+
+
+class EventScoreMatrixTests(TestCase):
+    def test_cumulative_series_with_bonus_games_apart(self):
+        alice, bob = make_users(2)
+        mk_event = make_event([alice, bob], num_games_planned=3)
+        play_game(mk_event, 1, {alice: {'kills': 3}, bob: {'kills': 1}})
+        play_game(mk_event, 2, {alice: {'kills': 2}})
+        play_game(mk_event, 3, {alice: {'kills': 9}}, status='inprogress')
+        bonus = Game.objects.create(masterkill_event=mk_event, game_number=1003, status='completed', spawn_location='BonusRoue')
+        GamePlayerStats.objects.create(game=bonus, player=alice, score_in_game=5)
+
+        matrix = event_score_matrix(mk_event, [alice.id, bob.id])
+        self.assertEqual(matrix['player_scores_per_game'], {str(alice.id): [3, 5], str(bob.id): [1, 1]})
+        self.assertEqual(matrix['num_games_played'], 2)
+        self.assertEqual(matrix['bonus_scores_per_game'], {str(alice.id): [5], str(bob.id): [0]})
+        self.assertEqual(matrix['num_bonus_games'], 1)
+
+    def test_two_queries_whatever_the_event_size(self):
+        users = make_users(6)
+        small = make_event(users[:2])
+        play_game(small, 1, {u: {'kills': 1} for u in users[:2]})
+        large = make_event(users, num_games_planned=8)
+        for number in range(1, 9):
+            play_game(large, number, {u: {'kills': number} for u in users})
+
+        for mk_event, participants in ((small, users[:2]), (large, users)):
+            with self.assertNumQueries(2):
+                event_score_matrix(mk_event, [u.id for u in participants])
+
+
+class EndGameTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(6)
+        self.client.force_authenticate(self.users[0])
+        self.mk_event = make_event(self.users, num_games_planned=5, points_kill=2, points_rea=3)
+
+    def end_game(self, game, player_stats):
+        return self.client.post(reverse('api:game-complete', args=[game.id]), {'player_stats': player_stats}, format='json')
+
+    def test_scores_use_recorded_revives(self):
+        alice, bob = self.users[:2]
+        game = Game.objects.create(masterkill_event=self.mk_event, game_number=1, status='inprogress')
+        ReviveEvent.objects.create(game=game, reviver_player=alice, revived_player=bob)
+        response = self.end_game(game, [{'player_id': alice.id, 'kills': 4, 'revives_done': 9}, {'player_id': bob.id, 'kills': 1}])
+        self.assertEqual(response.status_code, 200)
+        scores = dict(GamePlayerStats.objects.filter(game=game).values_list('player_id', 'score_in_game'))
+        self.assertEqual(scores, {alice.id: 4 * 2 + 3, bob.id: 2})
+
+    def test_query_count_does_not_depend_on_squad_size(self):
+        counts = []
+        for number, squad in ((1, self.users[:2]), (2, self.users[2:])):
+            game = Game.objects.create(masterkill_event=self.mk_event, game_number=number, status='inprogress')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.end_game(game, [{'player_id': u.id, 'kills': 2, 'deaths': 1} for u in squad])
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_invalid_stats_leave_nothing_written(self):
+        game = Game.objects.create(masterkill_event=self.mk_event, game_number=1, status='inprogress')
+        response = self.end_game(game, [{'player_id': self.users[0].id, 'kills': 2}, {'player_id': self.users[1].id, 'kills': 'beaucoup'}])
+        self.assertEqual(response.status_code, 400)
+        game.refresh_from_db()
+        self.assertEqual(game.status, 'inprogress')
+        self.assertFalse(GamePlayerStats.objects.filter(game=game).exists())
+
+
+class MasterkillEventQueryPlanTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(4)
+
+    def make_events(self, count, games):
+        for _ in range(count):
+            mk_event = make_event(self.users, num_games_planned=games + 1, creator=self.users[0], winner=self.users[1])
+            for number in range(1, games + 1):
+                play_game(mk_event, number, {user: {'kills': number} for user in self.users})
+            Game.objects.create(masterkill_event=mk_event, game_number=games + 1, status='inprogress', squad_leader=self.users[2])
+        return mk_event
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_list_query_count_does_not_grow_with_events(self):
+        url = reverse('api:masterkillevent-list-create')
+        self.make_events(2, games=1)
+        few, _ = self.count_queries(url)
+        self.make_events(4, games=3)
+        many, response = self.count_queries(url)
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.data), 6)
+
+    def test_detail_query_count_does_not_grow_with_games(self):
+        small = self.make_events(1, games=1)
+        large = self.make_events(1, games=6)
+        detail = lambda mk_event: reverse('api:masterkillevent-detail-update-destroy', args=[mk_event.id])
+        small_count, _ = self.count_queries(detail(small))
+        large_count, response = self.count_queries(detail(large))
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(response.data['completed_games_count'], 6)
+        self.assertEqual(response.data['current_game_info']['game_number'], 7)
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(2)
+        self.client.force_authenticate(self.users[0])
+        self.mk_event = make_event(self.users)
+        self.game = play_game(self.mk_event, 1, {user: {'kills': 2} for user in self.users}, status='inprogress')
+        self.url = reverse('api:masterkillevent-detail-update-destroy', args=[self.mk_event.id])
+
+    def test_detail_answers_304_to_its_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        for params in ({}, {'fields': 'id,name'}):
+            with self.subTest(**params), self.assertNumQueries(1):
+                unchanged = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual((unchanged.status_code, unchanged.content), (304, b''))
+            self.assertEqual(unchanged['ETag'], response['ETag'])
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        earlier = http_date(parse_http_date(last_modified) - 3600)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=earlier).status_code, 200)
+
+    def test_validators_change_after_a_revive_and_a_rule_edit(self):
+        etags = [self.client.get(self.url)['ETag']]
+        self.client.post(reverse('api:reviveevent-create'),
+                         {'game': self.game.id, 'reviver_player': self.users[0].id, 'revived_player': self.users[1].id})
+        etags.append(self.client.get(self.url)['ETag'])
+        self.assertEqual(self.client.patch(self.url, {'points_kill': 3}, format='json').status_code, 200)
+        etags.append(self.client.get(self.url)['ETag'])
+        self.assertEqual(len(set(etags)), 3)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[0]).status_code, 200)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        # ex aequo exacts, puis des dates distinctes d'une microseconde seulement (même milliseconde)
+        instant = timezone.now().replace(microsecond=123456)
+        stamps = [instant] * 4 + [instant + timedelta(microseconds=n) for n in (1, 2, 3)] + [instant - timedelta(seconds=1)] * 2
+        for created_at in stamps:
+            mk_event = MasterkillEvent.objects.create()
+            MasterkillEvent.objects.filter(pk=mk_event.pk).update(created_at=created_at)
+        self.expected = list(MasterkillEvent.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+
+    def walk(self, **params):
+        ids, url, pages = [], reverse('api:masterkillevent-list-create'), 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [event['id'] for event in response.data['results']]
+            pages += 1
+            if not response.data['next']:
+                return ids, pages
+            response = self.client.get(response.data['next'])
+
+    def test_every_page_is_walked_without_gaps_or_duplicates(self):
+        for params in ({'page_size': 1}, {'page_size': 2}, {'page_size': 2, 'fields': 'id,name'}):
+            with self.subTest(**params):
+                ids, pages = self.walk(**params)
+                self.assertEqual(ids, self.expected)
+                self.assertEqual(pages, -(-len(self.expected) // params['page_size']))
+
+    def test_tampered_cursors_are_rejected(self):
+        url = reverse('api:masterkillevent-list-create')
+        naive = base64.urlsafe_b64encode(json.dumps(["2026-10-18T12:00:00.123456", 1]).encode()).decode()
+        for cursor in ("pas-un-curseur", naive):
+            self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404)
+
+class ProjectionTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(3)
+        self.url = reverse('api:masterkillevent-list-create')
+
+    def make_events(self, count):
+        for _ in range(count):
+            mk_event = make_event(self.users, num_games_planned=4, winner=self.users[1])
+            play_game(mk_event, 1, {self.users[0]: {'kills': 2}})
+            Game.objects.create(masterkill_event=mk_event, game_number=2, status='inprogress', squad_leader=self.users[2])
+
+    def test_summary_is_a_single_query(self):
+        self.make_events(3)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'view': 'summary'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([list(row) for row in response.data], [list(SUMMARY_FIELDS)] * 3)
+        self.assertEqual({(row['completed_games_count'], row['participants_count']) for row in response.data}, {(1, 3)})
+
+    def test_unknown_fields_are_rejected(self):
+        self.make_events(1)
+        detail = reverse('api:masterkillevent-detail-update-destroy', args=[MasterkillEvent.objects.get().id])
+        for url in (self.url, detail):
+            response = self.client.get(url, {'fields': 'id,mot_de_passe'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("mot_de_passe", response.data['error'])
+        self.assertEqual(self.client.get(self.url, {'fields': ','}).status_code, 400)
+
+    def test_relations_are_loaded_once_per_page(self):
+        fields = 'id,participants_details,winner_details,games,current_game_info'
+        counts = []
+        for total in (1, 4):
+            self.make_events(total - MasterkillEvent.objects.count())
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url, {'fields': fields})
+            counts.append(len(queries))
+        # colonnes, participants, parties : une requête chacune, quel que soit le nombre de MK
+        self.assertEqual(counts, [3, 3])
+        row = response.data[0]
+        self.assertEqual(list(row), fields.split(','))
+        self.assertEqual([user['id'] for user in row['participants_details']], [user.id for user in self.users])
+        self.assertEqual(row['winner_details'], {'id': self.users[1].id, 'username': self.users[1].username})
+        self.assertEqual([game['game_number'] for game in row['games']], [1, 2])
+        self.assertEqual(row['current_game_info']['squad_leader_username'], self.users[2].username)
+
+
+class RankingTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(5)
+        mk_event = make_event(self.users)
+        play_game(mk_event, 1, {user: {'kills': i} for i, user in enumerate(self.users)})
+        call_command('rebuild_lifetime_stats', stdout=StringIO())
+        self.url = reverse('api:all-time-ranking')
+
+    def test_each_page_is_a_single_read(self):
+        with self.assertNumQueries(1):
+            first = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual([row['player_id'] for row in first.data['results']], [u.id for u in self.users[:-3:-1]])
+        second = self.client.get(first.data['next'])
+        self.assertEqual([row['player_id'] for row in second.data['results']], [u.id for u in self.users[2:0:-1]])
+        self.assertEqual(self.client.get(self.url, {'cursor': 'abc'}).status_code, 404)
+
+        PlayerLifetimeStats.objects.filter(player=self.users[0]).update(total_score=100)
+        self.assertEqual(self.client.get(self.url).data[0]['player_id'], self.users[0].id)
+
+class StatsResponseCacheTests(APITestCase):
+    def setUp(self):
+        caches[settings.STATS_CACHE_ALIAS].clear()
+        self.users = make_users(3)
+        self.mk_event = make_event(self.users)
+        self.game = play_game(self.mk_event, 1, {user: {'kills': i} for i, user in enumerate(self.users)})
+        self.url = reverse('api:masterkillevent-game-scores', args=[self.mk_event.id])
+
+    def test_hits_cost_the_validator_query_only(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            again = self.client.get(self.url)
+        self.assertEqual(again.data, first.data)
+
+    def test_any_write_that_changes_the_etag_changes_the_key(self):
+        alice = self.users[0]
+        self.client.get(self.url)
+        # écriture hors des vues (comme un autre processus) : pas d'invalidation, seul l'ETag change
+        GamePlayerStats.objects.filter(game=self.game, player=alice).update(score_in_game=42)
+        touch_game(self.game.id)
+        self.assertEqual(self.client.get(self.url).data['player_scores_per_game'][str(alice.id)], [42])
+
+class GameEventCounterTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(3)
+        self.client.force_authenticate(self.users[0])
+        self.mk_event = make_event(self.users, num_games_planned=3)
+        self.game = Game.objects.create(masterkill_event=self.mk_event, game_number=1, status='inprogress')
+
+    def revive(self, reviver, revived):
+        return self.client.post(reverse('api:reviveevent-create'),
+                                {'game': self.game.id, 'reviver_player': reviver.id, 'revived_player': revived.id})
+
+    def test_upsert_creates_missing_rows_and_adds_to_existing_ones(self):
+        alice, bob, carol = self.users
+        GamePlayerStats.objects.create(game=self.game, player=alice, kills=4, revives_done=2)
+        with self.assertNumQueries(1):
+            counters = increment_game_stats(self.game.id, {alice.id: {'revives_done': 3}, bob.id: {'revives_done': 1, 'times_redeployed_by_teammate': 2}})
+        self.assertEqual(counters, {
+            alice.id: {'revives_done': 5, 'times_redeployed_by_teammate': 0},
+            bob.id: {'revives_done': 1, 'times_redeployed_by_teammate': 2},
+        })
+        alice_row = GamePlayerStats.objects.get(game=self.game, player=alice)
+        self.assertEqual((alice_row.kills, alice_row.revives_done), (4, 5))
+        self.assertFalse(GamePlayerStats.objects.filter(game=self.game, player=carol).exists())
+
+    def test_revive_costs_an_insert_and_an_upsert(self):
+        alice, bob, _ = self.users
+        # partie, réanimateur et réanimé (validation du serializer), savepoint, INSERT, upsert, release ;
+        # les callbacks on_commit (diffusion en direct) sont exécutés et comptés aussi
+        with self.assertNumQueries(7), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.revive(alice, bob)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(response.status_code, 201)
+        self.revive(alice, bob)
+        self.assertEqual(GamePlayerStats.objects.get(game=self.game, player=alice).revives_done, 2)
+
+    def test_batch_cost_does_not_depend_on_its_size(self):
+        url = reverse('api:game-event-batch', args=[self.game.id])
+        counts = []
+        for size in (1, 12):
+            events = [{'type': 'revive', 'reviver_player': self.users[i % 3].id, 'revived_player': self.users[(i + 1) % 3].id}
+                      for i in range(size)]
+            events.append({'type': 'redeploy', 'redeployer_player': self.users[1].id, 'redeployed_player': self.users[2].id})
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.post(url, {'events': events}, format='json').status_code, 201)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(GamePlayerStats.objects.get(game=self.game, player=self.users[0]).revives_done, 1 + 4)
+
+    def test_retried_batch_is_not_counted_twice(self):
+        alice, bob, carol = self.users
+        url = reverse('api:game-event-batch', args=[self.game.id])
+        buffered = [
+            {'type': 'revive', 'reviver_player': alice.id, 'revived_player': bob.id, 'client_id': str(uuid.uuid4())},
+            {'type': 'redeploy', 'redeployer_player': bob.id, 'redeployed_player': carol.id, 'client_id': str(uuid.uuid4())},
+            {'type': 'revive', 'reviver_player': alice.id, 'revived_player': carol.id},     # sans identifiant
+        ]
+        first = self.client.post(url, {'events': buffered[:2]}, format='json')
+        self.assertEqual((first.status_code, first.data['duplicates']), (201, 0))
+
+        # réponse perdue : le client renvoie tout son tampon, plus un doublon interne au lot
+        retry = self.client.post(url, {'events': buffered + [buffered[2] | {'client_id': buffered[0]['client_id']}]}, format='json')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual((retry.data['created'], retry.data['duplicates']), ({'revive': 1, 'redeploy': 0}, 3))
+        self.assertEqual(GamePlayerStats.objects.get(game=self.game, player=alice).revives_done, 2)
+        self.assertEqual(GamePlayerStats.objects.get(game=self.game, player=carol).times_redeployed_by_teammate, 1)
+        self.assertEqual((ReviveEvent.objects.count(), RedeployEvent.objects.count()), (2, 1))
+
+        again = self.client.post(url, {'events': buffered[:2]}, format='json')
+        self.assertEqual((again.status_code, again.data['duplicates']), (200, 2))
+        bad = self.client.post(url, {'events': [buffered[0] | {'client_id': 'abc'}]}, format='json')
+        self.assertEqual(bad.status_code, 400)
+
+    def test_etag_changes_with_each_event(self):
+        url = reverse('api:masterkillevent-game-scores', args=[self.mk_event.id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.revive(*self.users[:2])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('api:redeployevent-create'),
+                         {'game': self.game.id, 'redeployer_player': self.users[1].id, 'redeployed_player': self.users[2].id})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+class LiveEventsTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(2)
+        self.client.force_authenticate(self.users[0])
+        self.mk_event = make_event(self.users)
+        self.game = Game.objects.create(masterkill_event=self.mk_event, game_number=1, status='inprogress')
+        self.broker = mock.Mock()
+        live.set_broker(self.broker)
+        self.addCleanup(live.set_broker, None)
+
+    def test_publish_fires_after_commit(self):
+        alice, bob = self.users
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('api:reviveevent-create'),
+                                        {'game': self.game.id, 'reviver_player': alice.id, 'revived_player': bob.id})
+            self.broker.publish.assert_not_called()
+        self.assertEqual(response.status_code, 201)
+        mk_id, kind, payload = self.broker.publish.call_args.args
+        self.assertEqual((mk_id, kind), (self.mk_event.id, 'revive'))
+        self.assertEqual((payload['type'], payload['game_id']), ('revive', self.game.id))
+
+    def test_publish_does_not_fire_on_rollback(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                live.publish(self.mk_event.id, 'revive', game_id=self.game.id)
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.broker.publish.assert_not_called()
+
+    def test_detail_advertises_the_stream(self):
+        url = reverse('api:masterkillevent-detail-update-destroy', args=[self.mk_event.id])
+        self.assertIs(self.client.get(url).data['live_stream'], False)
+        with self.settings(LIVE_EVENTS_ENABLED=True):
+            self.assertIs(self.client.get(url).data['live_stream'], True)
+        # sous WSGI (client de test) le flux n'est pas servi
+        with self.assertLogs('django.request', 'WARNING'):
+            stream = self.client.get(reverse('api:masterkillevent-stream', args=[self.mk_event.id]))
+        self.assertEqual(stream.status_code, 501)
+
+
+class LifetimeStatsTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(4)
+        self.client.force_authenticate(self.users[0])
+        self.mk_event = make_event(self.users, num_games_planned=2)
+
+    def assertTableMatchesLiveTotals(self):
+        # même comparaison que `manage.py rebuild_lifetime_stats --check-only`
+        call_command('rebuild_lifetime_stats', check_only=True, stdout=StringIO(), stderr=StringIO())
+
+    def end_game(self, game, kills):
+        response = self.client.post(reverse('api:game-complete', args=[game.id]), {'player_stats': [
+            {'player_id': user.id, 'kills': n, 'deaths': 2, 'gulag_status': 'won' if n > 3 else 'lost'}
+            for user, n in kills.items()
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_every_write_path_keeps_the_table_consistent(self):
+        alice, bob, carol, dave = self.users
+        game = Game.objects.create(masterkill_event=self.mk_event, game_number=1, status='inprogress')
+        self.client.post(reverse('api:reviveevent-create'), {'game': game.id, 'reviver_player': alice.id, 'revived_player': bob.id})
+        self.end_game(game, {alice: 5, bob: 1, carol: 2})
+        self.assertTableMatchesLiveTotals()
+
+        # corrections après la fin de la partie
+        self.client.post(reverse('api:reviveevent-create'), {'game': game.id, 'reviver_player': bob.id, 'revived_player': carol.id})
+        self.client.post(reverse('api:redeployevent-create'), {'game': game.id, 'redeployer_player': alice.id, 'redeployed_player': carol.id})
+        self.client.post(reverse('api:game-event-batch', args=[game.id]), {'events': [
+            {'type': 'revive', 'reviver_player': carol.id, 'revived_player': alice.id},
+            {'type': 'redeploy', 'redeployer_player': bob.id, 'redeployed_player': dave.id},
+        ]}, format='json')
+        game.refresh_from_db()
+        _apply_players(game, [{'gamertag': alice.username, 'kills': 9}])
+        self.assertTableMatchesLiveTotals()
+        # scores de la partie recalculés à chaque correction : même contrôle que `manage.py rescore_games --check-only`
+        call_command('rescore_games', check_only=True, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(GamePlayerStats.objects.get(game=game, player=carol).score_in_game, 2 + 1 - 1)
+
+        second = Game.objects.create(masterkill_event=self.mk_event, game_number=2, status='inprogress')
+        self.end_game(second, {alice: 1, dave: 7})
+        self.mk_event.refresh_from_db()
+        self.assertEqual(self.mk_event.status, 'completed')
+        detail = reverse('api:masterkillevent-detail-update-destroy', args=[self.mk_event.id])
+        self.client.patch(detail, {'winner': dave.id}, format='json')
+        self.client.post(reverse('api:masterkillevent-apply-bonus', args=[self.mk_event.id]), {'player_id': bob.id, 'bonus_points': 4})
+        self.client.patch(detail, {'points_kill': 3, 'winner': alice.id}, format='json')
+        self.assertTableMatchesLiveTotals()
+        self.assertEqual(PlayerLifetimeStats.objects.get(player=alice).mks_won, 1)
+
+        self.client.delete(detail)
+        self.assertTableMatchesLiveTotals()
+        self.assertFalse(PlayerLifetimeStats.objects.exists())
+
+    def test_game_completion_cost_does_not_depend_on_history(self):
+        veterans, newcomers = self.users[:2], self.users[2:]
+        for number in range(1, 11):
+            play_game(self.mk_event, number, {user: {'kills': number} for user in veterans})
+        MasterkillEvent.objects.filter(pk=self.mk_event.pk).update(num_games_planned=100)
+        call_command('rebuild_lifetime_stats', stdout=StringIO())
+
+        counts = []
+        for number, players in ((11, veterans), (12, newcomers), (13, newcomers)):
+            game = Game.objects.create(masterkill_event=self.mk_event, game_number=number, status='inprogress')
+            with CaptureQueriesContext(connection) as queries:
+                self.end_game(game, {user: 3 for user in players})
+            counts.append(len(queries))
+        # partie 12 : premières lignes des nouveaux joueurs, calculées en entier ; ensuite, mêmes deltas que les vétérans
+        self.assertEqual(counts[0], counts[2])
+        self.assertEqual(lifetime_totals(), {
+            row.pop('player_id'): row for row in PlayerLifetimeStats.objects.values('player_id', *lifetime_totals()[self.users[0].id])
+        })
+
+    def test_rescore_uses_each_event_rules_and_multipliers(self):
+        alice, bob = self.users[:2]
+        other = make_event(self.users[:2], points_kill=2)
+        play_game(self.mk_event, 1, {alice: {'kills': 3}, bob: {'kills': 1}}, revives=[(alice, bob)])
+        play_game(self.mk_event, 2, {alice: {'kills': 3}}, kill_multiplier=2.5)
+        play_game(other, 1, {bob: {'kills': 4}})
+        MasterkillEvent.objects.filter(pk=self.mk_event.pk).update(points_kill=3, points_rea=2)
+        MasterkillEvent.objects.filter(pk=other.pk).update(points_kill=5)
+
+        # couples (événement, multiplicateur), événements, un UPDATE par couple, updated_at
+        with self.assertNumQueries(1 + 1 + 3 + 1):
+            self.assertEqual(rescore_events(), 4)
+        call_command('rescore_games', check_only=True, stdout=StringIO(), stderr=StringIO())
+        scores = dict(GamePlayerStats.objects.filter(player=alice).values_list('game__kill_multiplier', 'score_in_game'))
+        self.assertEqual(scores, {1.0: 3 * 3 + 2, 2.5: int(3 * 3 * 2.5)})
+        self.assertEqual(GamePlayerStats.objects.get(game__masterkill_event=other).score_in_game, 20)
+
+    def test_rankings_expose_the_derived_kd_ratio(self):
+        play_game(self.mk_event, 1, {self.users[0]: {'kills': 3, 'deaths': 2}, self.users[1]: {'kills': 2}})
+        call_command('rebuild_lifetime_stats', stdout=StringIO())
+        ratios = {row['player_id']: row['kd_ratio'] for row in self.client.get(reverse('api:all-time-ranking')).data}
+        self.assertEqual(ratios, {self.users[0].id: 1.5, self.users[1].id: 2})
+
+
+class GamertagMatcherTests(TestCase):
+    def setUp(self):
+        self.users = {name: User.objects.create(username=name) for name in ("Shadow", "Lilou_92", "Bob0", "Bobo", "Kev")}
+        self.matcher = GamertagMatcher(self.users.values(), max_distance=2)
+
+    def match(self, gamertag):
+        user = self.matcher.match(gamertag)
+        return user and user.username
+
+    def test_normalization(self):
+        self.assertEqual(normalize_gamertag("[FR] Shadow#1234"), "shadow")
+        # '|' lu à la place d'un 'l' : ramené avant que la ponctuation soit retirée
+        self.assertEqual(normalize_gamertag("|i1ou_92"), normalize_gamertag("Lilou_92"))
+        self.assertEqual(normalize_gamertag("  "), "")
+
+    def test_exact_and_confusable_matches(self):
+        self.assertEqual(self.match("SHADOW"), "Shadow")
+        self.assertEqual(self.match("(ABC) Shad0w#99"), "Shadow")
+        self.assertEqual(self.match("|ilou 92"), "Lilou_92")
+
+    def test_bounded_edit_distance(self):
+        self.assertEqual(self.match("Shadw"), "Shadow")
+        self.assertIsNone(self.match("Shdw"))
+        # pseudo court : aucune tolérance
+        self.assertIsNone(self.match("Kew"))
+
+    def test_ambiguous_candidates_are_rejected(self):
+        # "Bob0" et "Bobo" ont la même clé normalisée
+        self.assertIsNone(self.match("bobo"))
+        self.assertIsNone(self.match("unknown"))
+
+    def test_resolve_players_stays_within_participants(self):
+        outsider = User.objects.create(username="Outsider")
+        mk_event = make_event([self.users["Shadow"], self.users["Bob0"], self.users["Bobo"]])
+        rows = [{"gamertag": "shad0w"}, {"gamertag": "BOBO"}, {"gamertag": "outsider"}]
+        with self.assertNumQueries(1):
+            matched, unmatched = resolve_players(mk_event, rows)
+        # ambigu après normalisation, départagé par le pseudo exact
+        self.assertEqual([(user.username, row["gamertag"]) for user, row in matched], [("Shadow", "shad0w"), ("Bobo", "BOBO")])
+        self.assertEqual(unmatched, [{"gamertag": "outsider"}])
+        self.assertNotIn(outsider, [user for user, _ in matched])
+
+class OCRCacheTests(APITestCase):
+    def test_results_stored_by_the_worker_are_served_to_the_web(self):
+        user, = make_users(1)
+        self.client.force_authenticate(user)
+        game = Game.objects.create(masterkill_event=make_event([user]), game_number=1)
+        image = b"capture du scoreboard"
+        players = [{"gamertag": "joueur0", "kills": 4, "revives": 1}]
+
+        def upload():
+            response = self.client.post(reverse('api:game-upload-screenshot', args=[game.id]),
+                                        {'file': SimpleUploadedFile('board.png', image)}, format='multipart')
+            return OCRJob.objects.get(id=response.data['job_id'])
+
+        first = upload()
+        self.assertEqual(first.status, 'pending')
+        # ce que renvoie run_ocr() au processus parent du worker
+        finish_ocr_job(first.id, players=players, cache_keys=[ocr_cache.content_key(image, pipeline_fingerprint())])
+
+        second = upload()
+        self.assertEqual((second.status, second.players), ('done', players))
+        stats = ocr_cache.stats()
+        self.assertEqual(stats['stores'], 1)
+        self.assertEqual((stats['content']['hits'], stats['content']['misses']), (1, 1))
+
+
+def _ocr_or_die(image):
+    # run_ocr de remplacement pour le worker, exécuté dans un processus du pool : b"oom" tue le processus
+    if image == b"oom":
+        os._exit(1)
+    return [{"gamertag": "joueur0", "kills": 3}], ()
+
+
+class OCRJobQueueTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(2)
+        self.client.force_authenticate(self.users[0])
+        self.game = Game.objects.create(masterkill_event=make_event(self.users), game_number=1)
+
+    def test_upload_claim_finish_and_apply(self):
+        response = self.client.post(reverse('api:game-upload-screenshot', args=[self.game.id]),
+                                    {'file': SimpleUploadedFile('board.png', b"capture")}, format='multipart')
+        self.assertEqual((response.status_code, response.data['status']), (202, 'pending'))
+        job_id = response.data['job_id']
+        detail = reverse('api:ocrjob-detail', args=[job_id])
+        apply = reverse('api:ocrjob-apply', args=[job_id])
+
+        self.assertEqual(claim_ocr_jobs(5), [(job_id, b"capture")])
+        self.assertEqual(claim_ocr_jobs(5), [])     # déjà réservé
+        self.assertEqual(self.client.get(detail).data['status'], 'running')
+        self.assertEqual(self.client.post(apply).status_code, 409)
+
+        finish_ocr_job(job_id, players=[{"gamertag": "JOUEUR1", "kills": 6}, {"gamertag": "inconnu", "kills": 2}])
+        job = self.client.get(detail).data
+        self.assertEqual((job['status'], len(job['players'])), ('done', 2))
+        self.assertEqual(bytes(OCRJob.objects.get(id=job_id).image), b"")
+
+        report = self.client.post(apply)
+        self.assertEqual(report.status_code, 200)
+        self.assertEqual([row['player_id'] for row in report.data['matched']], [self.users[1].id])
+        self.assertEqual([row['gamertag'] for row in report.data['unmatched']], ["inconnu"])
+        self.assertEqual(GamePlayerStats.objects.get(game=self.game, player=self.users[1]).kills, 6)
+        self.assertEqual(self.client.post(apply).status_code, 409)
+
+    def test_claims_oldest_first_and_requeues_stale_jobs(self):
+        jobs = [OCRJob.objects.create(game=self.game, image=f"capture {i}".encode()) for i in range(3)]
+        self.assertEqual([job_id for job_id, _ in claim_ocr_jobs(2)], [jobs[0].id, jobs[1].id])
+
+        OCRJob.objects.filter(id=jobs[0].id).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_ocr_jobs(), 1)
+        self.assertEqual([job_id for job_id, _ in claim_ocr_jobs(5)], [jobs[0].id, jobs[2].id])
+
+    def test_worker_survives_a_dead_process(self):
+        fatal = OCRJob.objects.create(game=self.game, image=b"oom")
+        survivor = OCRJob.objects.create(game=self.game, image=b"capture")
+        with mock.patch('api.management.commands.ocr_worker.run_ocr', _ocr_or_die):
+            call_command('ocr_worker', processes=1, once=True, stdout=StringIO(), stderr=StringIO())
+        fatal.refresh_from_db()
+        survivor.refresh_from_db()
+        self.assertEqual((fatal.status, survivor.status), ('failed', 'done'))
+        self.assertEqual(survivor.players[0]['kills'], 3)
+
+
+class BlankBackend:
+    # moteur factice : renvoie toujours les mêmes mots (aucun par défaut), ou échoue à chaque appel
+    name = "factice"
+    pooled = False
+
+    def __init__(self, error=None, words=()):
+        self.error = error
+        self.words = list(words)
+        self.calls = 0
+
+    def image_to_data(self, img, psm=None, whitelist=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.words
+
+
+class OCRBatchTests(APITestCase):
+    def setUp(self):
+        self.users = make_users(3)
+        self.client.force_authenticate(self.users[0])
+        self.game = Game.objects.create(masterkill_event=make_event(self.users), game_number=1)
+
+    def test_merge_keeps_the_most_confident_reading_of_each_gamertag(self):
+        jobs = [
+            OCRJob(id=1, status='done', players=[{"gamertag": "Joueur0", "kills": 4, "confidence": 60},
+                                                 {"gamertag": "joueur1", "kills": 2}]),
+            OCRJob(id=2, status='done', players=[{"gamertag": " JOUEUR0", "kills": 5, "confidence": 90},
+                                                 {"gamertag": "Joueur1", "kills": 9}]),
+            OCRJob(id=3, status='failed', players=[{"gamertag": "joueur2", "kills": 1}]),
+        ]
+        merged = merge_batch_players(reversed(jobs))
+        # joueur0 : la lecture la plus sûre ; joueur1 sans confiance : la première capture ; job en échec ignoré
+        self.assertEqual(sorted((p["gamertag"], p["kills"]) for p in merged), [(" JOUEUR0", 5), ("joueur1", 2)])
+
+    def test_batch_status_aggregates_its_jobs(self):
+        def status_of(*statuses):
+            return batch_status([OCRJob(status=s) for s in statuses])
+
+        self.assertEqual(status_of('pending', 'pending'), 'pending')
+        self.assertEqual(status_of('pending', 'done'), 'running')
+        self.assertEqual(status_of('pending', 'running'), 'running')
+        self.assertEqual(status_of('done', 'failed'), 'done')
+        self.assertEqual(status_of('failed', 'failed'), 'failed')
+
+    def test_upload_follow_and_apply_a_batch(self):
+        alice, bob, _ = self.users
+        upload = reverse('api:game-upload-screenshot-batch', args=[self.game.id])
+        files = [SimpleUploadedFile(f'board{i}.png', f"capture {i}".encode()) for i in range(2)]
+        with self.settings(OCR_BATCH_MAX_FILES=1):
+            self.assertEqual(self.client.post(upload, {'files': files}, format='multipart').status_code, 400)
+        for f in files:
+            f.seek(0)
+        response = self.client.post(upload, {'files': files}, format='multipart')
+        self.assertEqual((response.status_code, response.data['status']), (202, 'pending'))
+        first, second = response.data['job_ids']
+        detail = reverse('api:ocrbatch-detail', args=[response.data['batch_id']])
+        apply = reverse('api:ocrbatch-apply', args=[response.data['batch_id']])
+
+        finish_ocr_job(first, players=[{"gamertag": alice.username, "kills": 3, "confidence": 70}])
+        self.assertEqual(self.client.get(detail).data['status'], 'running')
+        self.assertEqual(self.client.post(apply).status_code, 409)
+
+        finish_ocr_job(second, players=[{"gamertag": alice.username.upper(), "kills": 8, "confidence": 95},
+                                        {"gamertag": bob.username, "kills": 1}])
+        batch = self.client.get(detail).data
+        self.assertEqual((batch['status'], len(batch['players'])), ('done', 2))
+
+        report = self.client.post(apply)
+        self.assertEqual(report.status_code, 200)
+        self.assertEqual(sorted(row['player_id'] for row in report.data['matched']), [alice.id, bob.id])
+        self.assertEqual(GamePlayerStats.objects.get(game=self.game, player=alice).kills, 8)
+        self.assertEqual(self.client.post(apply).status_code, 409)
+
+
+class OCRBackendTests(TestCase):
+    def test_missing_dependency_is_not_silently_replaced(self):
+        self.addCleanup(setattr, ocr, '_backend', ocr._backend)
+        ocr._backend = None
+        missing = ImportError("No module named 'tesserocr'")
+        with self.settings(OCR_BACKEND='tesserocr'), mock.patch.object(ocr.TesserocrBackend, '__init__', side_effect=missing):
+            with self.assertRaisesMessage(ImproperlyConfigured, "OCR_BACKEND='tesserocr' indisponible"):
+                ocr.get_backend()
+            with self.assertRaisesMessage(CommandError, "indisponible"):
+                call_command('ocr_worker', once=True, stdout=StringIO())
+
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+
+@skipUnless(tesserocr, "tesserocr non installé")
+class EnginePoolTests(TestCase):
+    def test_waiters_take_over_when_an_engine_fails_to_load(self):
+        loading = threading.Event()
+        release = threading.Event()
+
+        class BrokenBackend(TesserocrBackend):
+            def _new_engine(self):
+                loading.set()
+                release.wait()
+                raise RuntimeError("modèle introuvable")
+
+        backend = BrokenBackend(pool_size=1)
+        errors = []
+
+        def read():
+            try:
+                with backend._engine():
+                    pass
+            except RuntimeError as exc:
+                errors.append(exc)
+
+        first = threading.Thread(target=read, daemon=True)
+        first.start()
+        loading.wait()
+        # le pool est plein (un chargement en cours) : ce thread attend un moteur
+        second = threading.Thread(target=read, daemon=True)
+        second.start()
+        release.set()
+        for thread in (first, second):
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 2)
+
+
+class ScoreboardRegionTests(TestCase):
+    def test_region_covers_the_synthetic_scoreboard(self):
+        for case in build_cases([(1280, 720), (2560, 1440)], [0.0, 8.0], [0.8, 1.3], 1, 10):
+            with self.subTest(case.label):
+                gray = cv2.imdecode(np.frombuffer(case.png, np.uint8), cv2.IMREAD_GRAYSCALE)
+                found = ocr._locate_scoreboard(gray)
+                self.assertIsNotNone(found)
+                (x1, y1, x2, y2), text_height = found
+                # géométrie de render_scoreboard : panneau CROP, 4 colonnes, une ligne de 1,9 hauteur de police
+                panel = [int(ocr.CROP[k] * size) for k, size in (('x1', case.width), ('y1', case.height),
+                                                                 ('x2', case.width), ('y2', case.height))]
+                font_size = max(8, int(case.height * 0.024 * case.font_scale))
+                line = int(font_size * 1.9)
+                top = panel[1] + line // 2
+                bottom = top + (rows_fitting(case.height, case.font_scale, 10) - 1) * line + font_size
+                panel_w = panel[2] - panel[0]
+                self.assertLessEqual((x1, y1), (panel[0] + int(panel_w * 0.04), top))
+                self.assertGreater(x2, panel[0] + int(panel_w * 0.88))
+                self.assertGreaterEqual(y2, bottom - font_size // 2)
+                self.assertTrue(panel[0] <= x1 and panel[1] <= y1 and x2 <= panel[2] and y2 <= panel[3])
+                self.assertAlmostEqual(text_height, font_size, delta=font_size * 0.25)
+                # texte ramené à TARGET_TEXT_HEIGHT px (à 10 % près, pas de redimensionnement en deçà)
+                region = ocr._scoreboard(gray)
+                self.assertAlmostEqual(region.shape[0] / (y2 - y1) * text_height, ocr.TARGET_TEXT_HEIGHT,
+                                       delta=ocr.TARGET_TEXT_HEIGHT * 0.11)
+
+    def test_falls_back_to_the_fixed_crop(self):
+        blank = np.full((720, 1280), 90, np.uint8)
+        self.assertIsNone(ocr._locate_scoreboard(blank))
+        self.assertTrue(np.array_equal(ocr._scoreboard(blank), ocr._crop(blank)))
+
+
+class OCRBenchmarkTests(TestCase):
+    def setUp(self):
+        self.cases = build_cases([(640, 360)], [0.0], [1.0], images_per_config=2, rows_per_image=3)
+
+    def test_errors_are_logged_and_counted_by_type(self):
+        self.cases[0].png = b"pas une image"
+        with self.assertLogs('api.ocr_bench', 'ERROR') as logs:
+            report = run_benchmark(self.cases, BlankBackend())
+        self.assertIn("ValueError", logs.output[0])
+        self.assertEqual(report['overall']['errors'], 1)
+        self.assertEqual(report['overall']['error_types'], {'ValueError': 1})
+
+    def test_unpooled_backend_reads_a_capture_in_two_calls_at_most(self):
+        # pytesseract : un processus tesseract par appel, donc une passe en bloc (+ une relecture) par capture
+        line = [("joueur0", 95.0, 0), ("12", 91.0, 0), ("3", 88.0, 0)]
+        for confidence, expected_calls in ((95.0, 1), (40.0, 2)):
+            backend = BlankBackend(words=[*line, ("5", confidence, 0)])
+            players = extract_from_bytes(self.cases[0].png, use_cache=False, backend=backend)
+            self.assertEqual(backend.calls, expected_calls)
+            self.assertEqual([(p["gamertag"], p["kills"], p["deaths"]) for p in players], [("joueur0", 12, 5)])
+        backend = BlankBackend()
+        extract_from_bytes(self.cases[0].png, use_cache=False, backend=backend)
+        self.assertEqual(backend.calls, 2)
+
+    def test_aborts_when_every_sample_fails(self):
+        with self.assertLogs('api.ocr_bench'), self.assertRaisesMessage(BenchmarkFailed, "RuntimeError x2"):
+            run_benchmark(self.cases, BlankBackend(RuntimeError("moteur absent")))
+
+
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        self.url = reverse('api:metrics')
+        make_event(make_users(1))
+
+    @override_settings(DEBUG=False, METRICS_TOKEN='')
+    def test_closed_without_token_outside_debug(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN='s3cret')
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer autre').status_code, 403)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        exposition = response.content.decode()
+        # jauges d'EventStateCollector, lues en base à la collecte
+        self.assertIn('masterkill_events{status="inprogress"} 1.0', exposition)
+        self.assertIn('masterkill_events{status="completed"} 0.0', exposition)
+        self.assertIn('# TYPE masterkill_games gauge', exposition)
+
+
+class ServerTimingMiddlewareTests(TestCase):
+    def test_runs_natively_on_both_stacks(self):
+        def view(request):
+            User.objects.count()
+            return HttpResponse("ok")
+
+        async def async_view(request):
+            await sync_to_async(User.objects.count)()
+            with phase('ocr'):
+                pass
+            return HttpResponse("ok")
+
+        sync_middleware = ServerTimingMiddleware(view)
+        async_middleware = ServerTimingMiddleware(async_view)
+        self.assertFalse(iscoroutinefunction(sync_middleware))
+        self.assertTrue(iscoroutinefunction(async_middleware))
+
+        with self.assertLogs('api.timing') as logs:
+            responses = [sync_middleware(RequestFactory().get('/')), async_to_sync(async_middleware)(AsyncRequestFactory().get('/'))]
+        for response, record in zip(responses, logs.records):
+            self.assertEqual(json.loads(record.getMessage())['db_queries'], 1)
+            self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('ocr;dur=', responses[1]['Server-Timing'])
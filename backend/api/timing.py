@@ -0,0 +1,195 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+
+# Instrumentation par requête (ServerTimingMiddleware) :
+#   - requêtes SQL comptées et chronométrées par un execute_wrapper posé sur chaque connexion à son
+#     ouverture (connection_created) : il retrouve la requête HTTP courante par la ContextVar, donc aussi
+#     depuis le thread d'un sync_to_async (les connexions Django sont propres à chaque thread) ;
+#   - phases nommées (phase('serialize'), phase('ocr')) cumulées dans la requête courante,
+#     sans effet hors requête (worker OCR, commandes) ;
+#   - restitution dans l'en-tête Server-Timing, une ligne de log JSON (logger api.timing)
+#     et un histogramme de latence par vue, propre au processus (GET /api/timing/stats/) ;
+#     les mêmes mesures alimentent les métriques Prometheus multi-processus (api/metrics.py).
+# Coût : deux perf_counter() par requête SQL et par phase, un log par requête ; hors requête, une lecture
+# de ContextVar par requête SQL.
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_BUCKETS_MS = metrics.LATENCY_BUCKETS_MS
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    __slots__ = ('db_queries', 'db_time', 'phases')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def _count_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_queries += 1
+        timings.db_time += time.perf_counter() - started
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    # connection_created : rappelé à chaque reconnexion du même DatabaseWrapper
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    # encodage JSON de la réponse DRF, compté dans la phase 'serialize'
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class LatencyHistograms:
+    """
+    Histogrammes de latence par vue, à seaux fixes (en ms) : un compteur par seau, pas de valeurs conservées.
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, duration_ms):
+        index = bisect.bisect_left(self.buckets, duration_ms)
+        with self._lock:
+            entry = self._views.get(view)
+            if entry is None:
+                entry = self._views[view] = {'counts': [0] * (len(self.buckets) + 1), 'sum_ms': 0.0}
+            entry['counts'][index] += 1
+            entry['sum_ms'] += duration_ms
+
+    def snapshot(self):
+        # seaux cumulés ("le" = inférieur ou égal à), comme un histogramme Prometheus
+        with self._lock:
+            views = {view: (list(entry['counts']), entry['sum_ms']) for view, entry in self._views.items()}
+        result = {}
+        for view, (counts, sum_ms) in views.items():
+            cumulative, running = {}, 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                running += count
+                cumulative[str(bound)] = running
+            result[view] = {'count': running, 'sum_ms': round(sum_ms, 1), 'buckets': cumulative}
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+histograms = LatencyHistograms()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+def _server_timing(total, timings):
+    entries = [('db', timings.db_time, f"{timings.db_queries} requetes SQL")]    # en-tête HTTP : ASCII
+    entries += [(name, seconds, None) for name, seconds in timings.phases.items()]
+    app = max(0.0, total - sum(seconds for _, seconds, _ in entries))
+    parts = []
+    for name, seconds, desc in entries + [('app', app, None), ('total', total, None)]:
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if desc:
+            part += f';desc="{desc}"'
+        parts.append(part)
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """
+    À placer en tête de MIDDLEWARE pour que le total couvre toute la pile.
+    Désactivable par REQUEST_TIMING_ENABLED=False.
+    Synchrone ou asynchrone selon la pile en dessous : sous ASGI, pas de passage par un thread
+    juste pour lui (les phases et requêtes SQL exécutées via sync_to_async restent comptées,
+    le contexte de la requête y est copié).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._record(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._record(request, response, timings, time.perf_counter() - started)
+
+    def _record(self, request, response, timings, total):
+        view = _view_name(request)
+        histograms.observe(view, total * 1000)
+        metrics.observe_request(view, request.method, response.status_code, total, timings.db_queries)
+        response['Server-Timing'] = _server_timing(total, timings)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method, 'path': request.path, 'view': view, 'status': response.status_code,
+                'total_ms': round(total * 1000, 1), 'db_ms': round(timings.db_time * 1000, 1),
+                'db_queries': timings.db_queries,
+                **{f"{name}_ms": round(seconds * 1000, 1) for name, seconds in timings.phases.items()},
+            }))
+        return response
@@ -12,9 +12,11 @@ urlpatterns = [
     path('masterkillevents/<int:pk>/game-scores/', views.MasterkillGameScoresView.as_view(), name='masterkillevent-game-scores'),
     path('masterkillevents/<int:pk>/apply_bonus/', views.ApplyBonusView.as_view(), name='masterkillevent-apply-bonus'),
     path('masterkillevents/<int:pk>/kills-by-spawn/', views.MasterkillKillsBySpawnView.as_view(), name='masterkillevent-kills-by-spawn'),
+    path('masterkillevents/<int:pk>/stream/', views.masterkill_event_stream, name='masterkillevent-stream'),
     path('masterkillevents/count/', views.MasterkillEventCountView.as_view(), name='masterkillevent-count'),
     
     path('games/<int:game_pk>/complete/', views.EndGameAPIView.as_view(), name='game-complete'),
+    path('games/<int:game_pk>/events/', views.GameEventBatchView.as_view(), name='game-event-batch'),
     
     path('redeployevents/', views.RedeployEventCreateView.as_view(), name='redeployevent-create'),
     path('reviveevents/', views.ReviveEventCreateView.as_view(), name='reviveevent-create'),
@@ -26,4 +28,13 @@ urlpatterns = [
     path('users/list-for-participation/', views.UserListView.as_view(), name='user-list-for-participation'), 
     path('games/<int:pk>/upload-screenshot/', views.UploadScreenshotView.as_view(),
          name='game-upload-screenshot'),
+    path('games/<int:pk>/upload-screenshots/', views.UploadScreenshotBatchView.as_view(),
+         name='game-upload-screenshot-batch'),
+    path('ocr-jobs/<int:pk>/', views.OCRJobDetailView.as_view(), name='ocrjob-detail'),
+    path('ocr-jobs/<int:pk>/apply/', views.ApplyOCRJobView.as_view(), name='ocrjob-apply'),
+    path('ocr-batches/<uuid:batch_id>/', views.OCRBatchView.as_view(), name='ocrbatch-detail'),
+    path('ocr-batches/<uuid:batch_id>/apply/', views.ApplyOCRBatchView.as_view(), name='ocrbatch-apply'),
+    path('ocr-cache/stats/', views.OCRCacheStatsView.as_view(), name='ocr-cache-stats'),
+    path('timing/stats/', views.RequestTimingStatsView.as_view(), name='timing-stats'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
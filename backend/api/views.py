@@ -4,24 +4,41 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.db import transaction
 from django.db.models import Sum, Count, Q, F, FloatField, Case, When
 from rest_framework.permissions import IsAuthenticated
+import hmac
 import random
+import uuid
 from PIL import Image
 import pytesseract
 
 from rest_framework.parsers import MultiPartParser, FormParser
-#from ratelimit.decorators import ratelimit
-import os, tempfile
-from .ocr import extract
+from django.utils.decorators import method_decorator
+from django_ratelimit.decorators import ratelimit
+from .jobs import (
+    enqueue_ocr_job, enqueue_ocr_batch, apply_ocr_job, apply_ocr_batch, batch_status, merge_batch_players
+)
+from . import conditional, live, metrics, ocr_cache, response_cache, timing
+from .pagination import MasterkillEventPagination, RankingPagination, UserPagination
+from .projections import project_events, requested_fields
+from .stats import (
+    GAME_STATS_FIELDS, SCORING_FIELDS, apply_lifetime_deltas, completed_game_write, compute_game_score,
+    event_player_totals, event_score_matrix, game_contributions, increment_game_stat, increment_game_stats,
+    lifetime_delta, merge_deltas, mks_won_deltas, negate_deltas, rescore_events,
+)
 
-from .models import Gage, MasterkillEvent, Player, Game, GamePlayerStats, RedeployEvent, ReviveEvent
+from .models import Gage, MasterkillEvent, Player, Game, GamePlayerStats, RedeployEvent, ReviveEvent, PlayerLifetimeStats, OCRJob
 from .serializers import (
     GageSerializer, MasterkillEventSerializer, PlayerSerializer,
     GameSerializer, RedeployEventSerializer, GamePlayerStatsSerializer,
     AggregatedPlayerStatsSerializer, AllTimePlayerStatsSerializer,
-    UserRegistrationSerializer, UserSerializer, ReviveEventSerializer 
+    UserRegistrationSerializer, UserSerializer, ReviveEventSerializer, OCRJobSerializer
 )
 
 @api_view(['GET'])
@@ -45,68 +62,89 @@ class UserListViewForParticipation(generics.ListAPIView):
     queryset = User.objects.filter(is_staff=False, is_superuser=False).order_by('username')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = UserPagination
     
 class MasterkillAggregatedStatsView(APIView):
     permission_classes = [permissions.AllowAny]
     def get(self, request, pk=None):
-        mk_event = get_object_or_404(MasterkillEvent, pk=pk)
-        completed_games = mk_event.games.filter(status='completed')
-        aggregated_stats_list = []
-        for participant_user in mk_event.participants.all():
-            user_data_serialized = UserSerializer(participant_user).data
-            
-            revives_done_count = ReviveEvent.objects.filter(
-                game__in=completed_games, 
-                reviver_player=participant_user
-            ).count()
-
-            stats = GamePlayerStats.objects.filter(
-                game__in=completed_games, player=participant_user
-            ).aggregate(
-                total_kills=Sum('kills', default=0),
-                total_deaths=Sum('deaths', default=0),
-                total_assists=Sum('assists', default=0),
-                total_gulag_wins=Count('gulag_status', filter=Q(gulag_status='won')),
-                total_gulag_lost=Count('gulag_status', filter=Q(gulag_status='lost')),
-                total_times_executed_enemy=Sum('times_executed_enemy', default=0),
-                total_times_got_executed=Sum('times_got_executed', default=0),
-                total_rage_quits=Count('rage_quit', filter=Q(rage_quit=True)),
-                total_times_redeployed_by_teammate=Sum('times_redeployed_by_teammate', default=0),
-                total_score_from_games=Sum('score_in_game', default=0),
-                games_played_in_mk=Count('game', distinct=True)
-            )
-            player_aggregated_data = {
-                'player': user_data_serialized,
-                'total_kills': stats['total_kills'],
-                'total_deaths': stats['total_deaths'],
-                'total_assists': stats['total_assists'],
-                'total_gulag_wins': stats['total_gulag_wins'],
-                'total_gulag_lost': stats['total_gulag_lost'],
-                'total_revives_done': revives_done_count,
-                'total_times_executed_enemy': stats['total_times_executed_enemy'],
-                'total_times_got_executed': stats['total_times_got_executed'],
-                'total_rage_quits': stats['total_rage_quits'],
-                'total_times_redeployed_by_teammate': stats['total_times_redeployed_by_teammate'],
-                'total_score_from_games': stats['total_score_from_games'],
-                'games_played_in_mk': stats['games_played_in_mk']
-            }
-            aggregated_stats_list.append(player_aggregated_data)
-        serializer = AggregatedPlayerStatsSerializer(aggregated_stats_list, many=True)
-        return Response(serializer.data)
-
+        def compute():
+            mk_event = get_object_or_404(MasterkillEvent, pk=pk)
+            aggregated_stats_list = event_player_totals(mk_event)
+            return AggregatedPlayerStatsSerializer(aggregated_stats_list, many=True).data
+        validators = conditional.event_validators(pk)
+        unchanged = conditional.not_modified(request, validators)
+        if unchanged is not None:
+            return unchanged
+        data = response_cache.cached(validators, 'aggregated-stats', compute)
+        return conditional.with_validators(Response(data), validators)
+
+# `?fields=a,b,c` / `?view=summary` : projection .values() au lieu du serializer complet (voir api.projections)
 class MasterkillEventListCreateView(generics.ListCreateAPIView):
-    queryset = MasterkillEvent.objects.all().order_by('-created_at')
+    queryset = MasterkillEventSerializer.setup_eager_loading(MasterkillEvent.objects.all()).order_by('-created_at', 'id')
     serializer_class = MasterkillEventSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = MasterkillEventPagination
+
+    def list(self, request, *args, **kwargs):
+        try:
+            fields = requested_fields(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if fields is None:
+            return super().list(request, *args, **kwargs)
+        events = MasterkillEvent.objects.order_by('-created_at', 'id')
+        page = self.paginate_queryset(events.values('id', 'created_at'))
+        if page is None:
+            return Response(project_events(events, fields))
+        return self.get_paginated_response(project_events(events.filter(pk__in=[row['id'] for row in page]), fields))
     
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
 class MasterkillEventRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = MasterkillEvent.objects.all()
+    queryset = MasterkillEventSerializer.setup_eager_loading(MasterkillEvent.objects.all())
     serializer_class = MasterkillEventSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            fields = requested_fields(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        validators = conditional.event_validators(kwargs['pk'])
+        unchanged = conditional.not_modified(request, validators)
+        if unchanged is not None:
+            return unchanged
+        if fields is None:
+            return conditional.with_validators(super().retrieve(request, *args, **kwargs), validators)
+        rows = project_events(MasterkillEvent.objects.filter(pk=kwargs['pk']), fields)
+        if not rows:
+            raise Http404
+        return conditional.with_validators(Response(rows[0]), validators)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous = (serializer.instance.winner_id, serializer.instance.status)
+        previous_rules = [getattr(serializer.instance, field) for field in SCORING_FIELDS]
+        mk_event = serializer.save()
+        if [getattr(mk_event, field) for field in SCORING_FIELDS] != previous_rules:
+            # Barème modifié : les scores déjà stockés sont recalculés, l'écart est reporté sur les totaux all-time
+            with lifetime_delta(masterkill_event=mk_event):
+                rescore_events([mk_event])
+        # Le vainqueur (mks_won) peut avoir changé
+        apply_lifetime_deltas(mks_won_deltas(previous, (mk_event.winner_id, mk_event.status)))
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # les parties de l'événement disparaissent avec lui : leur contribution est retirée des totaux all-time
+        deltas = merge_deltas(
+            negate_deltas(game_contributions(masterkill_event=instance)),
+            mks_won_deltas((instance.winner_id, instance.status), (None, None)),
+        )
+        mk_event_id = instance.id
+        instance.delete()
+        apply_lifetime_deltas(deltas)
+
 class ManageGameView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -164,6 +202,11 @@ class ManageGameView(APIView):
                 if not mk_event.effective_start_at:
                     mk_event.effective_start_at = timezone.now()
                 mk_event.save()
+            live.publish(mk_event.id, 'game_started', mk_status=mk_event.status, game={
+                'id': next_game_to_start.id, 'game_number': next_game_to_start.game_number,
+                'squad_leader': next_game_to_start.squad_leader_id, 'kill_multiplier': next_game_to_start.kill_multiplier,
+                'start_time': next_game_to_start.start_time,
+            })
             
             return Response(GameSerializer(next_game_to_start).data, status=status.HTTP_200_OK)
 
@@ -174,36 +217,117 @@ class RedeployEventCreateView(generics.CreateAPIView):
     serializer_class = RedeployEventSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        redeploy_event = serializer.save()
-        stats, _ = GamePlayerStats.objects.get_or_create(
-            game=redeploy_event.game, 
-            player=redeploy_event.redeployed_player,
-            defaults={'game_id': redeploy_event.game.id, 'player_id': redeploy_event.redeployed_player.id}
-        )
-        stats.times_redeployed_by_teammate = (stats.times_redeployed_by_teammate or 0) + 1
-        stats.save()
+        data = serializer.validated_data
+        with completed_game_write(data['game'], [data['redeployed_player'].id]):
+            redeploy_event = serializer.save()
+            times_redeployed = increment_game_stat(
+                redeploy_event.game_id, redeploy_event.redeployed_player_id, 'times_redeployed_by_teammate'
+            )
+        live.publish(redeploy_event.game.masterkill_event_id, 'redeploy', game_id=redeploy_event.game_id,
+                     redeployer_id=redeploy_event.redeployer_player_id, redeployed_id=redeploy_event.redeployed_player_id,
+                     times_redeployed_by_teammate=times_redeployed)
 
 class ReviveEventCreateView(generics.CreateAPIView):
     queryset = ReviveEvent.objects.all()
     serializer_class = ReviveEventSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        revive_event = serializer.save()
-        stats, _ = GamePlayerStats.objects.get_or_create(
-            game=revive_event.game, 
-            player=revive_event.reviver_player,
-            defaults={'game_id': revive_event.game.id, 'player_id': revive_event.reviver_player.id}
-        )
-        stats.revives_done = (stats.revives_done or 0) + 1
-        stats.save()
+        data = serializer.validated_data
+        with completed_game_write(data['game'], [data['reviver_player'].id]):
+            revive_event = serializer.save()
+            revives_done = increment_game_stat(revive_event.game_id, revive_event.reviver_player_id, 'revives_done')
+        live.publish(revive_event.game.masterkill_event_id, 'revive', game_id=revive_event.game_id,
+                     reviver_id=revive_event.reviver_player_id, revived_id=revive_event.revived_player_id,
+                     revives_done=revives_done)
+
+# Réas / redéploiements d'une partie envoyés par lot (client hors ligne qui vide son tampon) :
+# une requête id__in pour tous les joueurs, un bulk_create par type, un upsert groupé pour les compteurs.
+# Chaque événement peut porter un `client_id` (UUID, unique en base) : un lot renvoyé après un timeout
+# ne compte pas deux fois les événements déjà enregistrés, qui sont ignorés et comptés dans `duplicates`.
+# type -> (modèle, champ auteur, champ cible, (joueur crédité, compteur incrémenté)) comme les vues unitaires
+GAME_EVENT_TYPES = {
+    'revive': (ReviveEvent, 'reviver_player', 'revived_player', ('reviver_player', 'revives_done')),
+    'redeploy': (RedeployEvent, 'redeployer_player', 'redeployed_player', ('redeployed_player', 'times_redeployed_by_teammate')),
+}
+
+class GameEventBatchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request, game_pk=None):
+        # Verrou sur la partie : deux envois du même tampon ne peuvent pas passer ensemble le contrôle des doublons
+        game = get_object_or_404(Game.objects.select_for_update(), pk=game_pk)
+        events = request.data.get('events')
+        if not isinstance(events, list) or not events:
+            return Response({"error": "Le champ 'events' doit être une liste non vide."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > settings.GAME_EVENTS_BATCH_MAX:
+            return Response({"error": f"{settings.GAME_EVENTS_BATCH_MAX} événements maximum par envoi."}, status=status.HTTP_400_BAD_REQUEST)
+
+        parsed = []
+        for index, event in enumerate(events):
+            kind = event.get('type') if isinstance(event, dict) else None
+            if kind not in GAME_EVENT_TYPES:
+                return Response({"error": f"Événement {index} : type attendu parmi {', '.join(GAME_EVENT_TYPES)}."}, status=status.HTTP_400_BAD_REQUEST)
+            _, actor_field, target_field, _ = GAME_EVENT_TYPES[kind]
+            try:
+                players = {actor_field: int(event[actor_field]), target_field: int(event[target_field])}
+            except (KeyError, TypeError, ValueError):
+                return Response({"error": f"Événement {index} : '{actor_field}' et '{target_field}' doivent être des identifiants valides."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                client_id = uuid.UUID(str(event['client_id'])) if event.get('client_id') is not None else None
+            except ValueError:
+                return Response({"error": f"Événement {index} : 'client_id' doit être un UUID."}, status=status.HTTP_400_BAD_REQUEST)
+            parsed.append((kind, players, client_id))
+
+        user_ids = {user_id for _, players, _ in parsed for user_id in players.values()}
+        known_ids = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        if user_ids - known_ids:
+            return Response({"error": f"Utilisateurs inconnus : {', '.join(map(str, sorted(user_ids - known_ids)))}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        seen = set()
+        for kind, (model, *_) in GAME_EVENT_TYPES.items():
+            client_ids = [client_id for k, _, client_id in parsed if k == kind and client_id]
+            if client_ids:
+                seen.update(model.objects.filter(client_id__in=client_ids).values_list('client_id', flat=True))
+
+        to_create = {kind: [] for kind in GAME_EVENT_TYPES}
+        deltas = {}
+        duplicates = 0
+        for kind, players, client_id in parsed:
+            if client_id in seen:
+                duplicates += 1
+                continue
+            if client_id:
+                seen.add(client_id)     # doublon à l'intérieur du même lot
+            model, _, _, (credited_field, counter) = GAME_EVENT_TYPES[kind]
+            to_create[kind].append(model(game=game, client_id=client_id, **{f"{name}_id": user_id for name, user_id in players.items()}))
+            counts = deltas.setdefault(players[credited_field], {})
+            counts[counter] = counts.get(counter, 0) + 1
+
+        created = {kind: len(objects) for kind, objects in to_create.items()}
+        if not deltas:
+            # lot déjà entièrement enregistré : rien à écrire
+            return Response({"game_id": game.id, "created": created, "duplicates": duplicates, "counters": {}}, status=status.HTTP_200_OK)
+        with completed_game_write(game, deltas):
+            for kind, objects in to_create.items():
+                if objects:
+                    GAME_EVENT_TYPES[kind][0].objects.bulk_create(objects)
+            counters = increment_game_stats(game.id, deltas)
+        live.publish(game.masterkill_event_id, 'events', game_id=game.id, created=created, counters=counters)
+        return Response({"game_id": game.id, "created": created, "duplicates": duplicates, "counters": counters},
+                        status=status.HTTP_201_CREATED)
 
 class EndGameAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @transaction.atomic
     def post(self, request, game_pk=None):
-        game_instance = get_object_or_404(Game, pk=game_pk)
+        # Verrou sur la partie : deux fins de partie simultanées ne peuvent pas s'entrelacer
+        game_instance = get_object_or_404(Game.objects.select_for_update().select_related('masterkill_event'), pk=game_pk)
         mk_event = game_instance.masterkill_event
 
         if game_instance.status == 'completed':
@@ -218,48 +342,50 @@ class EndGameAPIView(APIView):
         if not isinstance(player_stats_data_list, list):
             return Response({"error": "Le champ 'player_stats' doit être une liste."}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Nombre d'allers-retours fixe quelle que soit la taille de l'escouade :
+        # un id__in pour les joueurs, un GROUP BY pour les réas, un upsert groupé pour les stats.
+        rows_by_player_id = {}
         for player_data in player_stats_data_list:
             if not player_data: continue
             player_id = player_data.get('player_id')
             if not player_id: continue
             try:
-                player_instance = User.objects.get(pk=player_id) 
-            except User.DoesNotExist:
-                continue
+                rows_by_player_id[int(player_id)] = {
+                    'kills': int(player_data.get('kills', 0)),
+                    'deaths': int(player_data.get('deaths', 0)),
+                    'assists': int(player_data.get('assists', 0)),
+                    'gulag_status': player_data.get('gulag_status', 'not_played'),
+                    'revives_done': int(player_data.get('revives_done', 0)),
+                    'times_executed_enemy': int(player_data.get('times_executed_enemy', 0)),
+                    'times_got_executed': int(player_data.get('times_got_executed', 0)),
+                    'rage_quit': bool(player_data.get('rage_quit', False)),
+                    'times_redeployed_by_teammate': int(player_data.get('times_redeployed_by_teammate', 0)),
+                }
+            except (TypeError, ValueError):
+                return Response({"error": f"Statistiques invalides pour le joueur {player_id}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        users = User.objects.in_bulk(rows_by_player_id.keys())
+        revives_by_player_id = dict(
+            ReviveEvent.objects.filter(game=game_instance, reviver_player_id__in=users.keys())
+            .order_by().values('reviver_player').annotate(c=Count('id')).values_list('reviver_player', 'c')
+        )
 
-            kills = int(player_data.get('kills', 0))
-            deaths = int(player_data.get('deaths', 0))
-            gulag_status = player_data.get('gulag_status', 'not_played')
-            revives_done_from_payload = int(player_data.get('revives_done', 0))
-            times_executed_enemy = int(player_data.get('times_executed_enemy', 0))
-            times_got_executed = int(player_data.get('times_got_executed', 0))
-            rage_quit = bool(player_data.get('rage_quit', False))
-            times_redeployed_by_teammate = int(player_data.get('times_redeployed_by_teammate', 0))
-
-            actual_revives_done_for_score = ReviveEvent.objects.filter(game=game_instance, reviver_player=player_instance).count()
-
-            score = 0
-            score += (kills * mk_event.points_kill * game_instance.kill_multiplier)
-            score += actual_revives_done_for_score * mk_event.points_rea
-            if gulag_status == 'won':
-                score += mk_event.points_goulag_win
-            score += times_redeployed_by_teammate * mk_event.points_redeploiement
-            if rage_quit:
-                score += mk_event.points_rage_quit
-            score += times_executed_enemy * mk_event.points_execution
-            score += times_got_executed * mk_event.points_humiliation
-            
-            stats_defaults = {
-                'kills': kills, 'deaths': deaths, 'assists': player_data.get('assists', 0),
-                'gulag_status': gulag_status, 
-                'revives_done': revives_done_from_payload,
-                'times_executed_enemy': times_executed_enemy, 'times_got_executed': times_got_executed,
-                'rage_quit': rage_quit, 'times_redeployed_by_teammate': times_redeployed_by_teammate,
-                'score_in_game': score
-            }
-            GamePlayerStats.objects.update_or_create(
-                game=game_instance, player=player_instance,
-                defaults=stats_defaults
+        stats_to_upsert = []
+        for player_id, user_instance in users.items():
+            row = rows_by_player_id[player_id]
+            # Le score utilise les réas enregistrées pendant la partie, pas celles du payload
+            row['score_in_game'] = compute_game_score(
+                mk_event, game_instance.kill_multiplier,
+                revives=revives_by_player_id.get(player_id, 0), **row
+            )
+            stats_to_upsert.append(GamePlayerStats(game=game_instance, player=user_instance, **row))
+
+        if stats_to_upsert:
+            GamePlayerStats.objects.bulk_create(
+                stats_to_upsert,
+                update_conflicts=True,
+                unique_fields=['game', 'player'],
+                update_fields=GAME_STATS_FIELDS + ['score_in_game'],
             )
         
         game_instance.status = 'completed'
@@ -270,11 +396,21 @@ class EndGameAPIView(APIView):
 
         completed_games_count = mk_event.games.filter(status='completed').count()
         mk_status_updated_to_completed = False
+        previous_mk = (mk_event.winner_id, mk_event.status)
         if completed_games_count >= mk_event.num_games_planned:
             mk_event.status = 'completed'
             mk_event.ended_at = timezone.now()
             mk_event.save()
             mk_status_updated_to_completed = True
+        # la partie vient de passer terminée : sa contribution entière s'ajoute aux totaux all-time
+        apply_lifetime_deltas(merge_deltas(
+            game_contributions(pk=game_instance.id),
+            mks_won_deltas(previous_mk, (mk_event.winner_id, mk_event.status)),
+        ))
+        live.publish(mk_event.id, 'game_completed', game_id=game_instance.id, game_number=game_instance.game_number,
+                     spawn_location=game_instance.spawn_location, mk_status=mk_event.status,
+                     mk_ended=mk_status_updated_to_completed,
+                     scores={stats.player_id: stats.score_in_game for stats in stats_to_upsert})
             
         return Response({
             "message": f"Partie {game_instance.game_number} terminée.", "game_id": game_instance.id,
@@ -285,85 +421,31 @@ class EndGameAPIView(APIView):
 class AllTimePlayerRankingView(generics.ListAPIView):
     serializer_class = AllTimePlayerStatsSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = RankingPagination
 
     def get_queryset(self):
-        users_with_stats = User.objects.filter(game_stats__game__status='completed').distinct()
-        player_rankings = []
-        for user_instance in users_with_stats:
-            total_revives_done_by_player = ReviveEvent.objects.filter(
-                game__status='completed', 
-                reviver_player=user_instance
-            ).count()
-
-            stats = GamePlayerStats.objects.filter(player=user_instance, game__status='completed').aggregate(
-                total_score=Sum('score_in_game', default=0),
-                total_kills=Sum('kills', default=0),
-                total_deaths=Sum('deaths', default=0),
-                total_assists=Sum('assists', default=0),
-                total_gulag_wins=Count('gulag_status', filter=Q(gulag_status='won')),
-                total_rage_quits=Count('rage_quit', filter=Q(rage_quit=True)),
-                total_times_redeployed=Sum('times_redeployed_by_teammate', default=0),
-                games_played=Count('game', distinct=True)
-            )
-            mks_won = MasterkillEvent.objects.filter(winner=user_instance, status='completed').count()
-            
-            deaths_for_kd = stats['total_deaths'] if stats['total_deaths'] > 0 else 1
-            kd_ratio = round((stats['total_kills'] or 0) / deaths_for_kd, 2)
-            if stats['total_deaths'] == 0 and stats['total_kills'] > 0 : kd_ratio = stats['total_kills']
-
-            player_data = {
-                'player_id': user_instance.id,
-                'username': user_instance.username,
-                'total_score': stats['total_score'], 'total_kills': stats['total_kills'],
-                'total_deaths': stats['total_deaths'], 'total_assists': stats['total_assists'],
-                'total_revives_done': total_revives_done_by_player,
-                'total_gulag_wins': stats['total_gulag_wins'],
-                'total_rage_quits': stats['total_rage_quits'], 'total_times_redeployed': stats['total_times_redeployed'],
-                'games_played': stats['games_played'], 'mks_won': mks_won, 'kd_ratio': kd_ratio
-            }
-            player_rankings.append(player_data)
-        
-        player_rankings.sort(key=lambda x: x['total_score'], reverse=True)
-        return player_rankings
+        # Lecture unique de la table dénormalisée (index sur -total_score)
+        return PlayerLifetimeStats.objects.select_related('player').order_by('-total_score', 'player')
 
 class MasterkillGameScoresView(APIView):
     permission_classes = [permissions.AllowAny]
     def get(self, request, pk=None):
-        mk_event = get_object_or_404(MasterkillEvent, pk=pk)
-        response_data = {
-            'mk_id': mk_event.id, 'mk_name': mk_event.name, 
-            'num_games_planned': mk_event.num_games_planned,
-            'participants': UserSerializer(mk_event.participants.all(), many=True).data,
-            'player_scores_per_game': {}
-        }
-        
-        completed_games_instances = mk_event.games.filter(status='completed').order_by('game_number')
-        num_games_actually_completed = completed_games_instances.count()
-        
-        if num_games_actually_completed == 0:
-             for participant_user in mk_event.participants.all():
-                response_data['player_scores_per_game'][str(participant_user.id)] = []
-             response_data['num_games_played'] = 0
-             return Response(response_data)
-
-        for participant_user in mk_event.participants.all():
-            user_id_str = str(participant_user.id)
-            response_data['player_scores_per_game'][user_id_str] = []
-            cumulative_score = 0
-            
-            for i in range(1, num_games_actually_completed + 1):
-                game_for_this_number = completed_games_instances.filter(game_number=i).first()
-                current_game_score_for_this_game_only = 0
-                if game_for_this_number:
-                    stat_entry = GamePlayerStats.objects.filter(game=game_for_this_number, player=participant_user).first()
-                    if stat_entry:
-                        current_game_score_for_this_game_only = stat_entry.score_in_game
-                
-                cumulative_score += current_game_score_for_this_game_only
-                response_data['player_scores_per_game'][user_id_str].append(cumulative_score)
-        
-        response_data['num_games_played'] = num_games_actually_completed
-        return Response(response_data)
+        def compute():
+            mk_event = get_object_or_404(MasterkillEvent, pk=pk)
+            participants = list(mk_event.participants.all())
+            response_data = {
+                'mk_id': mk_event.id, 'mk_name': mk_event.name, 
+                'num_games_planned': mk_event.num_games_planned,
+                'participants': UserSerializer(participants, many=True).data,
+            }
+            response_data.update(event_score_matrix(mk_event, [user.id for user in participants]))
+            return response_data
+        validators = conditional.event_validators(pk)
+        unchanged = conditional.not_modified(request, validators)
+        if unchanged is not None:
+            return unchanged
+        data = response_cache.cached(validators, 'game-scores', compute)
+        return conditional.with_validators(Response(data), validators)
 
 class ApplyBonusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -387,18 +469,22 @@ class ApplyBonusView(APIView):
             if user_instance not in mk_event.participants.all():
                 return Response({"error": "Cet utilisateur ne participe pas à cet événement."}, status=status.HTTP_400_BAD_REQUEST)
             
-            bonus_game, _ = Game.objects.get_or_create(
-                masterkill_event=mk_event,
-                game_number=mk_event.num_games_planned + 1000,
-                defaults={'status': 'completed', 'spawn_location': 'BonusRoue', 'kill_multiplier': 1.0}
-            )
-            bonus_stat, created_stat = GamePlayerStats.objects.update_or_create(
-                game=bonus_game, player=user_instance,
-                defaults={'score_in_game': bonus_points}
-            )
-            if not created_stat:
-                bonus_stat.score_in_game = F('score_in_game') + bonus_points
-                bonus_stat.save()
+            with transaction.atomic():
+                bonus_game, _ = Game.objects.get_or_create(
+                    masterkill_event=mk_event,
+                    game_number=mk_event.num_games_planned + 1000,
+                    defaults={'status': 'completed', 'spawn_location': 'BonusRoue', 'kill_multiplier': 1.0}
+                )
+                bonus_stat, created_stat = GamePlayerStats.objects.update_or_create(
+                    game=bonus_game, player=user_instance,
+                    defaults={'score_in_game': bonus_points}
+                )
+                if not created_stat:
+                    bonus_stat.score_in_game = F('score_in_game') + bonus_points
+                    bonus_stat.save()
+                conditional.touch_game(bonus_game.id)
+                apply_lifetime_deltas({user_instance.id: {'total_score': bonus_points, 'games_played': int(created_stat)}})
+                live.publish(mk_event.id, 'bonus', player_id=user_instance.id, bonus_points=bonus_points)
             return Response({"message": f"Bonus de {bonus_points} appliqué à {user_instance.username}."}, status=status.HTTP_200_OK)
         except User.DoesNotExist:
             return Response({"error": "Utilisateur non trouvé."}, status=status.HTTP_404_NOT_FOUND)
@@ -408,21 +494,40 @@ class ApplyBonusView(APIView):
 class MasterkillKillsBySpawnView(APIView):
     permission_classes = [permissions.AllowAny]
     def get(self, request, pk=None):
-        mk_event = get_object_or_404(MasterkillEvent, pk=pk)
-        kills_by_spawn = GamePlayerStats.objects.filter(
-            game__masterkill_event=mk_event, game__status='completed',
-            game__spawn_location__isnull=False
-        ).exclude(game__spawn_location__exact='').values(
-            'game__spawn_location'
-        ).annotate(
-            total_kills_at_spawn=Sum('kills')
-        ).order_by('-total_kills_at_spawn')
-        
-        data_for_response = [
-            {'spawn_location': item['game__spawn_location'], 'total_kills': item['total_kills_at_spawn']}
-            for item in kills_by_spawn if item['game__spawn_location']
-        ]
-        return Response(data_for_response)
+        def compute():
+            mk_event = get_object_or_404(MasterkillEvent, pk=pk)
+            kills_by_spawn = GamePlayerStats.objects.filter(
+                game__masterkill_event=mk_event, game__status='completed',
+                game__spawn_location__isnull=False
+            ).exclude(game__spawn_location__exact='').values(
+                'game__spawn_location'
+            ).annotate(
+                total_kills_at_spawn=Sum('kills')
+            ).order_by('-total_kills_at_spawn')
+
+            return [
+                {'spawn_location': item['game__spawn_location'], 'total_kills': item['total_kills_at_spawn']}
+                for item in kills_by_spawn if item['game__spawn_location']
+            ]
+        validators = conditional.event_validators(pk)
+        unchanged = conditional.not_modified(request, validators)
+        if unchanged is not None:
+            return unchanged
+        data = response_cache.cached(validators, 'kills-by-spawn', compute)
+        return conditional.with_validators(Response(data), validators)
+
+# Flux SSE des deltas d'un Masterkill (voir api.live) : vue Django asynchrone, hors DRF
+@require_GET
+async def masterkill_event_stream(request, pk):
+    if not isinstance(request, ASGIRequest):
+        # sous WSGI le flux bloquerait un worker sans jamais rien envoyer
+        return JsonResponse({"error": "Le flux en direct nécessite le serveur ASGI (config.asgi)."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    if not await MasterkillEvent.objects.filter(pk=pk).aexists():
+        raise Http404
+    response = StreamingHttpResponse(live.event_stream(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'    # nginx : ne pas mettre le flux en tampon
+    return response
     
 class MasterkillEventCountView(APIView):
     permission_classes = [permissions.AllowAny] 
@@ -434,16 +539,18 @@ class UserListView(generics.ListAPIView):
     queryset = User.objects.filter(is_active=True).order_by('username')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = UserPagination
 
 class UploadScreenshotView(APIView):
     """
     POST /api/games/<pk>/upload-screenshot/
     Body (multipart) : file=<screenshot>
+    Crée un job OCR (traité par `manage.py ocr_worker`) et répond 202 avec son id.
     """
     permission_classes = [permissions.IsAuthenticated]
     parser_classes     = [MultiPartParser, FormParser]
 
-    @ratelimit(key='user', rate='5/m', block=True)
+    @method_decorator(ratelimit(key='user', rate='5/m', block=True))
     def post(self, request, pk):
         game = get_object_or_404(Game, pk=pk)
         upfile = request.FILES.get('file')
@@ -452,26 +559,122 @@ class UploadScreenshotView(APIView):
         if upfile.size > 6 * 2**20:
             return Response({"detail": "File too large"}, 400)
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
-            for chunk in upfile.chunks():
-                tmp.write(chunk)
-            local_path = tmp.name
+        job = enqueue_ocr_job(game, request.user, upfile)
+        return Response({"job_id": job.id, "status": job.status}, status=status.HTTP_202_ACCEPTED)
 
-        players = extract(local_path)
-        os.unlink(local_path)              # nettoyage
+class UploadScreenshotBatchView(APIView):
+    """
+    POST /api/games/<pk>/upload-screenshots/
+    Body (multipart) : files=<screenshot> (plusieurs fois)
+    Un job OCR par capture, traités en parallèle par le pool du worker ; suivi via /api/ocr-batches/<batch_id>/.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes     = [MultiPartParser, FormParser]
 
-        for p in players:
-            user, _ = User.objects.get_or_create(username__iexact=p["gamertag"],
-                                                 defaults={"username": p["gamertag"]})
-            gps, _ = GamePlayerStats.objects.get_or_create(game=game, player=user)
-            gps.kills   = p["kills"]
-            gps.revives_done = p["revives"]
-            gps.save()
+    @method_decorator(ratelimit(key='user', rate='5/m', block=True))
+    def post(self, request, pk):
+        game = get_object_or_404(Game, pk=pk)
+        upfiles = request.FILES.getlist('files')
+        if not upfiles:
+            return Response({"detail": "No file"}, 400)
+        if len(upfiles) > settings.OCR_BATCH_MAX_FILES:
+            return Response({"detail": f"Too many files (max {settings.OCR_BATCH_MAX_FILES})"}, 400)
+        if any(f.size > 6 * 2**20 for f in upfiles):
+            return Response({"detail": "File too large"}, 400)
+
+        batch_id, jobs = enqueue_ocr_batch(game, request.user, upfiles)
+        return Response({"batch_id": batch_id, "job_ids": [job.id for job in jobs], "status": batch_status(jobs)},
+                        status=status.HTTP_202_ACCEPTED)
+
+class OCRBatchMixin:
+    def _jobs(self, batch_id):
+        jobs = list(OCRJob.objects.defer('image').select_related('game__masterkill_event').filter(batch_id=batch_id))
+        if not jobs:
+            raise Http404
+        return jobs
+
+    def _payload(self, batch_id, jobs):
+        return {
+            "batch_id": batch_id, "game": jobs[0].game_id, "status": batch_status(jobs),
+            "players": merge_batch_players(jobs),
+            "jobs": OCRJobSerializer(jobs, many=True).data,
+        }
+
+class OCRBatchView(OCRBatchMixin, APIView):
+    """
+    GET /api/ocr-batches/<batch_id>/ : état du lot et joueurs fusionnés (dédoublonnés par gamertag).
+    """
+    permission_classes = [permissions.IsAuthenticated]
 
-        game.has_auto_stats = True
-        game.save(update_fields=['has_auto_stats'])
+    def get(self, request, batch_id):
+        return Response(self._payload(batch_id, self._jobs(batch_id)))
 
-        return Response({"players": players}, status=201)
+class ApplyOCRBatchView(OCRBatchMixin, APIView):
+    """
+    POST /api/ocr-batches/<batch_id>/apply/ : écrit les joueurs fusionnés dans GamePlayerStats, en une transaction.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, batch_id):
+        jobs = self._jobs(batch_id)
+        current_status = batch_status(jobs)
+        if current_status in ('pending', 'running'):
+            return Response({"error": f"Le lot OCR n'est pas terminé (statut : {current_status})."}, status=status.HTTP_409_CONFLICT)
+        if any(job.applied_at for job in jobs):
+            return Response({"error": "Les résultats de ce lot ont déjà été appliqués."}, status=status.HTTP_409_CONFLICT)
+        report = apply_ocr_batch(jobs)
+        return Response({**self._payload(batch_id, self._jobs(batch_id)), **report}, status=status.HTTP_200_OK)
+
+class OCRJobDetailView(generics.RetrieveAPIView):
+    """
+    GET /api/ocr-jobs/<pk>/ : état du job et joueurs lus une fois terminé.
+    """
+    queryset = OCRJob.objects.defer('image')
+    serializer_class = OCRJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+class OCRCacheStatsView(APIView):
+    """
+    GET /api/ocr-cache/stats/ : hits / misses du cache des résultats OCR, par type de clé.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({"enabled": ocr_cache.enabled(), **ocr_cache.stats()})
+
+class RequestTimingStatsView(APIView):
+    """
+    GET /api/timing/stats/ : histogrammes de latence par vue (ms) du processus qui répond.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({"buckets_ms": timing.histograms.buckets, "views": timing.histograms.snapshot()})
+
+# Scrape Prometheus : vue Django simple (texte brut, jeton Bearer propre à l'endpoint, pas de token DRF)
+@require_GET
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}") if token else settings.DEBUG
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE_LATEST)
+
+class ApplyOCRJobView(APIView):
+    """
+    POST /api/ocr-jobs/<pk>/apply/ : reporte les joueurs lus dans les GamePlayerStats de la partie.
+    Les gamertags sans correspondance parmi les joueurs connus sont renvoyés dans `unmatched`.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        job = get_object_or_404(OCRJob.objects.defer('image').select_related('game__masterkill_event'), pk=pk)
+        if job.status != 'done':
+            return Response({"error": f"Le job OCR n'est pas terminé (statut : {job.status})."}, status=status.HTTP_409_CONFLICT)
+        if job.applied_at:
+            return Response({"error": "Les résultats de ce job ont déjà été appliqués."}, status=status.HTTP_409_CONFLICT)
+        report = apply_ocr_job(job)
+        return Response({**OCRJobSerializer(job).data, **report}, status=status.HTTP_200_OK)
 
 class GameScreenshotOCRView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -486,7 +689,8 @@ class GameScreenshotOCRView(APIView):
 
         try:
             image = Image.open(img_file)
-            raw_text = pytesseract.image_to_string(image, lang='eng')   # langue à ajuster
+            with timing.phase('ocr'):
+                raw_text = pytesseract.image_to_string(image, lang='eng')   # langue à ajuster
             # ————————————————
             # ✂️  Ici : parse raw_text pour extraire {gamertag,kills,revives}
             # Exemple bidon :
@@ -16,6 +16,9 @@ else
     echo "--- [BUILD SCRIPT] manage.py migrate SUCCEEDED ---"
 fi
 
+echo "--- [BUILD SCRIPT] Running manage.py createcachetable ---"
+python manage.py createcachetable # table du cache OCR en base (CACHES 'ocr'), sans effet si elle existe
+
 echo "--- [BUILD SCRIPT] Running manage.py collectstatic ---"
 python manage.py collectstatic --no-input --clear
 
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# seule l'app ASGI sert le flux en direct (api.views.masterkill_event_stream)
+os.environ.setdefault('LIVE_EVENTS_ENABLED', 'True')
 
 application = get_asgi_application()
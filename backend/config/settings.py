@@ -1,6 +1,7 @@
 # settings.py
 from pathlib import Path
 import os
+import sys
 import dj_database_url
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -9,6 +10,8 @@ SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'django-insecure-kxzwc71wc#4-8(
 
 DEBUG = os.environ.get('DJANGO_DEBUG', 'False') == 'True'
 
+TESTING = sys.argv[1:2] == ['test']     # `manage.py test`
+
 ALLOWED_HOSTS = []
 RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
 if RENDER_EXTERNAL_HOSTNAME:
@@ -31,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.timing.ServerTimingMiddleware', # en tête : Server-Timing + log JSON par requête (voir api/timing.py)
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -109,9 +113,74 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.timing.TimedJSONRenderer', # JSONRenderer dont le temps d'encodage est compté dans Server-Timing
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Instrumentation par requête (voir api/timing.py) : SQL, sérialisation, OCR
+REQUEST_TIMING_ENABLED = os.environ.get('REQUEST_TIMING_ENABLED', 'True') == 'True'
+# GET /api/metrics (Prometheus, voir api/metrics.py) : en-tête "Authorization: Bearer <METRICS_TOKEN>" ;
+# sans jeton, l'endpoint n'est ouvert qu'en DEBUG. Plusieurs processus : PROMETHEUS_MULTIPROC_DIR (variable d'environnement)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# File OCR (api.OCRJob) traitée par `python manage.py ocr_worker`
+OCR_WORKER_PROCESSES = int(os.environ.get('OCR_WORKER_PROCESSES', os.cpu_count() or 1))
+OCR_WORKER_POLL_INTERVAL = float(os.environ.get('OCR_WORKER_POLL_INTERVAL', '1.0'))
+OCR_JOB_TIMEOUT = int(os.environ.get('OCR_JOB_TIMEOUT', '300')) # secondes avant de remettre en file un job 'running'
+OCR_MATCH_MAX_DISTANCE = int(os.environ.get('OCR_MATCH_MAX_DISTANCE', '2')) # distance d'édition max gamertag OCR / participant
+OCR_BATCH_MAX_FILES = int(os.environ.get('OCR_BATCH_MAX_FILES', '5')) # captures max par upload groupé
+# Moteur OCR : 'tesserocr' (moteurs gardés en mémoire, lecture cellule par cellule avec whitelists par colonne)
+# ou 'pytesseract' (un processus tesseract par capture, lue en bloc : moins précis, sans la lib libtesseract)
+OCR_BACKEND = os.environ.get('OCR_BACKEND', 'tesserocr')
+OCR_ENGINE_POOL_SIZE = int(os.environ.get('OCR_ENGINE_POOL_SIZE', '1')) # moteurs tesserocr par processus
+OCR_ROW_WORKERS = int(os.environ.get('OCR_ROW_WORKERS', '4')) # lignes du scoreboard lues en parallèle par capture
+OCR_MIN_CONFIDENCE = float(os.environ.get('OCR_MIN_CONFIDENCE', '80')) # confiance Tesseract (0-100) sous laquelle une cellule est relue
+# Cache des résultats OCR (voir api/ocr_cache.py) : clé = hash du contenu, et optionnellement hash perceptif du crop
+OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', 'True') == 'True'
+OCR_CACHE_PERCEPTUAL = os.environ.get('OCR_CACHE_PERCEPTUAL', 'False') == 'True'
+OCR_CACHE_PHASH_SIZE = int(os.environ.get('OCR_CACHE_PHASH_SIZE', '16')) # grille du dHash (16 -> 256 bits)
+OCR_CACHE_ALIAS = 'ocr'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Résultats OCR (voir api/ocr_cache.py) : écrits par `manage.py ocr_worker`, lus par le web, donc partagés.
+    # Par défaut en base (table créée par `manage.py createcachetable`) ; chaque entrée expire après TIMEOUT
+    'ocr': {
+        'BACKEND': os.environ.get('OCR_CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.environ.get('OCR_CACHE_LOCATION', 'ocr_cache'),
+        'TIMEOUT': int(os.environ.get('OCR_CACHE_TTL', 24 * 3600)),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('OCR_CACHE_MAX_ENTRIES', '500'))},
+    },
+    # Réponses des endpoints de stats (voir api/response_cache.py) : clés tirées de l'ETag lu en base, donc
+    # un cache par processus suffit ; STATS_CACHE_BACKEND / LOCATION pour un Redis partagé entre workers
+    'stats': {
+        'BACKEND': os.environ.get('STATS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('STATS_CACHE_LOCATION', 'stats'),
+        'TIMEOUT': int(os.environ.get('STATS_CACHE_TTL', 3600)),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('STATS_CACHE_MAX_ENTRIES', '2000'))},
+    },
+}
+STATS_CACHE_ALIAS = 'stats'
+STATS_CACHE_LOCK_TIMEOUT = 10   # secondes : durée max d'un recalcul avant que le verrou single-flight expire
+STATS_CACHE_LOCK_WAIT = 2.0     # secondes d'attente d'un recalcul en cours avant de calculer soi-même
+
+# Flux SSE par Masterkill (voir api/live.py) : servi uniquement par l'app ASGI,
+# p. ex. `gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker`.
+# LIVE_EVENTS_ENABLED (posé par config.asgi) est annoncé au client dans le détail d'un MK (live_stream) :
+# sous WSGI le flux répond 501, le front ne l'ouvre pas.
+LIVE_EVENTS_ENABLED = os.environ.get('LIVE_EVENTS_ENABLED', 'False') == 'True'
+LIVE_EVENTS_BACKEND = os.environ.get('LIVE_EVENTS_BACKEND', 'api.live.LocalBroker') # en mémoire : un seul processus
+LIVE_EVENTS_HEARTBEAT = float(os.environ.get('LIVE_EVENTS_HEARTBEAT', '15')) # secondes entre deux commentaires ": ping"
+LIVE_EVENTS_QUEUE_SIZE = 100    # messages en attente par client avant de le déconnecter
+LIVE_EVENTS_RETRY_MS = 3000     # délai de reconnexion annoncé au navigateur
+
+GAME_EVENTS_BATCH_MAX = int(os.environ.get('GAME_EVENTS_BATCH_MAX', '200')) # réas / redéploiements max par envoi groupé
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -135,6 +204,13 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': False,
         },
+        # une ligne JSON par requête (durées, nombre de requêtes SQL) ; WARNING pour les couper,
+        # le défaut sous `manage.py test` (les tests qui les lisent passent par assertLogs)
+        'api.timing': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_TIMING_LOG_LEVEL', 'WARNING' if TESTING else 'INFO'),
+            'propagate': False,
+        },
     },
 }
 
@@ -8,5 +8,51 @@ export async function uploadScreenshot (gameId, file) {
     fd,
     { headers: { 'Content-Type': 'multipart/form-data' } }
   )
-  return data.players          // [{gamertag,kills,revives}]
+  return data                  // { job_id, status } — l'OCR tourne en tâche de fond
+}
+
+export async function getOcrJob (jobId) {
+  const { data } = await apiClient.get(`/ocr-jobs/${jobId}/`)
+  return data                  // { id, status, players: [{gamertag,kills,revives}], error, … }
+}
+
+export async function waitForOcrJob (jobId, { interval = 1500, timeout = 120000 } = {}) {
+  const deadline = Date.now() + timeout
+  for (;;) {
+    const job = await getOcrJob(jobId)
+    if (job.status === 'done' || job.status === 'failed') return job
+    if (Date.now() > deadline) throw new Error('OCR trop long, réessaie plus tard.')
+    await new Promise(resolve => setTimeout(resolve, interval))
+  }
+}
+
+export async function applyOcrJob (jobId) {
+  const { data } = await apiClient.post(`/ocr-jobs/${jobId}/apply/`)
+  return data
+}
+
+export async function uploadScreenshots (gameId, files) {
+  const fd = new FormData()
+  for (const file of files) fd.append('files', file)
+  const { data } = await apiClient.post(
+    `/games/${gameId}/upload-screenshots/`,
+    fd,
+    { headers: { 'Content-Type': 'multipart/form-data' } }
+  )
+  return data                  // { batch_id, job_ids, status }
+}
+
+export async function waitForOcrBatch (batchId, { interval = 1500, timeout = 120000 } = {}) {
+  const deadline = Date.now() + timeout
+  for (;;) {
+    const { data } = await apiClient.get(`/ocr-batches/${batchId}/`)
+    if (data.status === 'done' || data.status === 'failed') return data   // players : lignes fusionnées
+    if (Date.now() > deadline) throw new Error('OCR trop long, réessaie plus tard.')
+    await new Promise(resolve => setTimeout(resolve, interval))
+  }
+}
+
+export async function applyOcrBatch (batchId) {
+  const { data } = await apiClient.post(`/ocr-batches/${batchId}/apply/`)
+  return data
 }